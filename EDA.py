@@ -1,13 +1,22 @@
-import os, glob
+import os, glob, json, argparse, time, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.stats import linregress, norm
+
+import trendStats
+import batchEDA
+import plots
+import seasonal
+import spatial
+from ingestCache import IngestCache, parse_workbook
+from metrics import METRICS
+from resultsStore import ResultsStore, file_fingerprint, frame_fingerprint
+from tiers import TIERED_MODES, Tiers, TierStore
 
 # ========= SETTINGS =========
 BASE_DIR = r"AndhraPradesh"   # 👈 change this path if needed
 OUTPUT_DIR = os.path.join(BASE_DIR, "outputs")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # ========= HELPERS =========
 def clean_df(df):
@@ -17,157 +26,400 @@ def clean_df(df):
     return df.dropna(subset=['dataTime','dataValue'])
 
 def trend_info(ts):
-    ts = ts.dropna()
-    if len(ts) < 3: return np.nan, np.nan
-    x = np.arange(len(ts))
-    res = linregress(x, ts.values)
-    return res.slope * 12, res.pvalue  # slope per year
+    slope, pval = trendStats.ols_trend(ts.dropna().values)
+    return slope * 12, pval  # slope per year
+
+def trend_intercept(ts, slope_per_year):
+    """OLS intercept matching trend_info: level at the first non-empty month (x = 0, 1, ... over those)."""
+    y = ts.dropna().values
+    return float(y.mean() - slope_per_year / 12 * (len(y) - 1) / 2) if len(y) >= 3 else np.nan
 
 def mann_kendall_test(x):
-    x = np.array(x.dropna())
-    n = len(x)
-    if n < 3: return np.nan
-    s = sum(np.sign(x[j]-x[i]) for i in range(n-1) for j in range(i+1,n))
-    var_s = (n*(n-1)*(2*n+5))/18
-    z = (s-1 if s>0 else s+1 if s<0 else 0)/np.sqrt(var_s)
-    return 2*(1 - norm.cdf(abs(z)))
-
-# ========= PROCESS FILES =========
-summary_rows = []
-folders = [os.path.join(BASE_DIR, "Manual"), os.path.join(BASE_DIR, "Telemetry")]
-
-for folder in folders:
-    for f in glob.glob(os.path.join(folder, "*.xls*")):
-        try:
-            xls = pd.ExcelFile(f)
-        except Exception as e:
-            print("⚠️ Could not open:", f, e)
-            continue
+    # O(n log n) S with tie-corrected variance (see trendStats)
+    return trendStats.mk_test(np.array(x.dropna()))[2]
 
-        info = {}
-        if "Info" in xls.sheet_names:
-            try:
-                info_df = pd.read_excel(f, sheet_name="Info", header=None)
-                for _, row in info_df.iterrows():
-                    if len(row.dropna())>=2:
-                        k = str(row.iloc[0]).strip().lower()
-                        info[k] = row.iloc[1]
-            except Exception as e:
-                print("⚠️ Could not parse Info sheet in", f, e)
-
-        if "Data" not in xls.sheet_names:
-            print("⚠️ Skipping (no Data sheet):", f)
-            continue
+# ========= LOADERS =========
+# Loaders yield work items for analyse_input(): ("excel", path, source,
+# cache_dir, tiers_dir) is parsed inside the worker; ("frame", station_file,
+# source, info, df) is already in memory. Telemetry stations with current
+# tiers (see tiers.py) come as their monthly means instead of raw readings,
+# which gives the same monthly statistics.
 
-        try:
-            df = clean_df(pd.read_excel(f, sheet_name="Data"))
-        except Exception as e:
-            print("⚠️ Could not read Data sheet in", f, e)
-            continue
+def info_from_meta(meta):
+    return {str(k).strip().lower(): v for k, v in meta.items() if v is not None}
+
+def iter_excel_inputs(base_dir, use_cache=True, use_tiers=True):
+    cache_dir = os.path.join(base_dir, ".cache", "ingest") if use_cache else None
+    tiers_dir = base_dir if use_tiers else None
+    folders = [os.path.join(base_dir, "Manual"), os.path.join(base_dir, "Telemetry")]
+    for folder in folders:
+        for f in glob.glob(os.path.join(folder, "*.xls*")):
+            yield ("excel", f, os.path.basename(folder), cache_dir, tiers_dir)
 
-        if df.empty: 
-            print("⚠️ No usable data in:", f)
+def iter_parquet_inputs(base_dir, use_cache=True, use_tiers=True):
+    import pyarrow.dataset as ds
+    from storage import ParquetStore
+    store = ParquetStore(base_dir)
+    stations = store.read_stations()
+    if stations.empty:
+        return
+    tier_store = TierStore(base_dir) if use_tiers else None
+    tiered = set()   # stations whose raw readings are not needed
+    if tier_store is not None:
+        for row in stations[stations["mode"].astype(str).isin(TIERED_MODES)].to_dict("records"):
+            if tier_store.fresh(row["mode"], row["station_file"], store.parts(row)):
+                tiered.add(row["station_id"])
+    data = store.read_data(columns=["station_id", "dataTime", "dataValue"],
+                           filter=~ds.field("station_id").isin(sorted(tiered)) if tiered else None)
+    groups = dict(list(data.groupby("station_id", observed=True, sort=False)))
+    order = {"Manual": 0, "Telemetry": 1}
+    stations = stations.sort_values("mode", key=lambda m: m.astype(str).map(order), kind="stable")
+    for row in stations.itertuples(index=False):
+        info = info_from_meta(json.loads(row.meta_json))
+        if row.station_id in tiered:
+            yield ("frame", row.station_file, str(row.mode), info,
+                   tier_store.load(row.mode, row.station_file, ["monthly"]).series("monthly"))
             continue
+        df = groups.get(row.station_id)
+        if df is None:
+            df = pd.DataFrame(columns=["dataTime", "dataValue"])
+        df = clean_df(df.drop(columns="station_id"))
+        if tier_store is not None and str(row.mode) in TIERED_MODES and not df.empty:
+            tiers = Tiers.from_frame(df, json.loads(row.meta_json))
+            tier_store.save(row.mode, row.station_file, tiers)
+            df = tiers.series("monthly")
+        yield ("frame", row.station_file, str(row.mode), info, df)
+
+def detect_storage(base_dir):
+    return "parquet" if os.path.exists(os.path.join(base_dir, "dataset", "stations.parquet")) else "excel"
+
+LOADERS = {"excel": iter_excel_inputs, "parquet": iter_parquet_inputs}
+
+# ========= PER-STATION SUMMARY =========
+def station_fields(station_file, source, info):
+    """Descriptive columns of a summary row (everything except the statistics)."""
+    # ---- District handling ----
+    district_val = (
+        info.get("district") or
+        info.get("District") or
+        info.get("districtname") or
+        info.get("District Name")
+    )
+    if not district_val:
+        # take from filename prefix
+        district_val = station_file.split("_")[0]
+
+    return {
+        "station_file": station_file,
+        "source": source,  # manual or telemetry
+        "station_name": info.get("stationname",""),
+        "district": str(district_val),
+        "lat": pd.to_numeric(info.get("latitude",np.nan), errors="coerce"),
+        "lon": pd.to_numeric(info.get("longitude",np.nan), errors="coerce"),
+    }
+
+def station_summary(station_file, source, info, df):
+    df_monthly = df.set_index("dataTime").resample("M").mean(numeric_only=True)
 
-        df_monthly = df.set_index("dataTime").resample("M").mean(numeric_only=True)
+    slope, pval = trend_info(df_monthly["dataValue"])
+    mk_p = mann_kendall_test(df_monthly["dataValue"])
 
-        slope, pval = trend_info(df_monthly["dataValue"])
-        mk_p = mann_kendall_test(df_monthly["dataValue"])
+    # Always append with full set of keys
+    row = station_fields(station_file, source, info)
+    row.update({
+        "monthly_points": int(len(df_monthly)),
+        "mean_level": float(df_monthly["dataValue"].mean()) if not df_monthly.empty else np.nan,
+        "trend_slope_m_per_year": slope,
+        "trend_intercept_m": trend_intercept(df_monthly["dataValue"], slope),
+        "trend_pval": pval,
+        "mk_pval": mk_p,
+    })
+    row.update(seasonal.series_anomalies(df_monthly["dataValue"]))   # anomaly_months, latest_* columns
+    return row
 
-        if len(df_monthly) >= 3:
-            z = (df_monthly["dataValue"] - df_monthly["dataValue"].mean())/df_monthly["dataValue"].std()
-            anomaly_months = int((z.abs()>2).sum())
+# ========= WORKER =========
+def load_input(item):
+    """(station_file, source, info, df, messages) for a loader item; df is None if unusable."""
+    if item[0] == "excel":
+        _, f, source, cache_dir, tiers_dir = item
+        station_file = os.path.basename(f)
+        tier_store = TierStore(tiers_dir) if tiers_dir and source in TIERED_MODES else None
+        if tier_store is not None and tier_store.fresh(source, station_file, [f]):
+            tiers = tier_store.load(source, station_file, ["monthly"])
+            return station_file, source, info_from_meta(tiers.meta), tiers.series("monthly"), []
+        if cache_dir:
+            info, df, messages = IngestCache(cache_dir).load(f, clean_df)
         else:
-            anomaly_months = 0
-
-        # ---- District handling ----
-        district_val = (
-            info.get("district") or
-            info.get("District") or
-            info.get("districtname") or
-            info.get("District Name")
-        )
-        if not district_val:
-            # take from filename prefix
-            district_val = os.path.basename(f).split("_")[0]
-
-        # Always append with full set of keys
-        summary_rows.append({
-            "station_file": os.path.basename(f),
-            "source": os.path.basename(folder),  # manual or telemetry
-            "station_name": info.get("stationname",""),
-            "district": str(district_val),
-            "lat": pd.to_numeric(info.get("latitude",np.nan), errors="coerce"),
-            "lon": pd.to_numeric(info.get("longitude",np.nan), errors="coerce"),
-            "monthly_points": int(len(df_monthly)),
-            "mean_level": float(df_monthly["dataValue"].mean()) if not df_monthly.empty else np.nan,
-            "trend_slope_m_per_year": slope,
-            "trend_pval": pval,
-            "mk_pval": mk_p,
-            "anomaly_months": anomaly_months
-        })
-
-# ========= SAVE SUMMARIES =========
-summary_df = pd.DataFrame(summary_rows)
-
-print("\n=== Debug Info ===")
-print("Summary DF shape:", summary_df.shape)
-print("Columns:", list(summary_df.columns))
-print(summary_df.head(), "\n")
-
-summary_df.to_csv(os.path.join(OUTPUT_DIR,"station_summary.csv"), index=False)
-
-# ========= DISTRICT SUMMARY =========
-if not summary_df.empty and all(col in summary_df.columns for col in 
-    ["district","station_file","trend_slope_m_per_year","anomaly_months"]):
-    
-    district_summary = summary_df.groupby("district").agg(
+            info, df, messages = parse_workbook(f, clean_df)
+        if tier_store is not None and df is not None and not df.empty:
+            tiers = Tiers.from_frame(df, info)
+            tier_store.save(source, station_file, tiers)
+            df = tiers.series("monthly")
+    else:
+        _, station_file, source, info, df = item
+        messages = []
+
+    if df is not None and df.empty:
+        messages.append(f"⚠️ No usable data in: {item[1]}")
+        df = None
+    return station_file, source, info, df, messages
+
+def analyse_input(item):
+    """Load one station and summarise it -> (messages, row or None, timings).
+
+    Runs in the main process or a pool worker; never raises, so one bad
+    file cannot abort the batch. timings holds (wall, cpu) per step and the
+    row count, for METRICS in the main process.
+    """
+    name = item[1]
+    timings = {}
+    try:
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        station_file, source, info, df, messages = load_input(item)
+        timings["load"] = (time.perf_counter() - wall0, time.process_time() - cpu0)
+        if df is None:
+            return messages, None, timings
+        timings["rows"] = len(df)
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        row = station_summary(station_file, source, info, df)
+        timings["summarise"] = (time.perf_counter() - wall0, time.process_time() - cpu0)
+        return messages, row, timings
+    except Exception as e:
+        return [f"⚠️ Failed to analyse {name}: {e!r}"], None, timings
+
+def safe_load_input(item):
+    try:
+        return load_input(item)
+    except Exception as e:
+        return item[1], None, {}, None, [f"⚠️ Failed to load {item[1]}: {e!r}"]
+
+def pool_map(fn, items, workers=1):
+    """Yield fn(item) in input order, on `workers` processes.
+
+    Spawned, not forked: orchestrate.py calls this while its download and
+    scrape threads hold sessions, locks and SQLite handles.
+    """
+    if workers <= 1:
+        for item in items:
+            yield fn(item)
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        yield from pool.map(fn, items, chunksize=8)
+
+# ========= ENGINES =========
+def run_station_engine(items, workers=1):
+    """Per-station pipeline: one DataFrame, resample and test per station."""
+    summary_rows = []
+    for messages, row, timings in pool_map(analyse_input, items, workers):
+        for msg in messages:
+            print(msg)
+        for step in ("load", "summarise"):
+            if step in timings:
+                METRICS.add_stage(step, *timings[step])
+        METRICS.count("rows", timings.get("rows", 0))
+        if row is not None:
+            summary_rows.append(row)
+    return pd.DataFrame(summary_rows)
+
+def run_batch_engine(items, workers=1):
+    """Whole-state pipeline: load everything, then one long-format pass (batchEDA)."""
+    fields, frames = [], []
+    with METRICS.stage("load"):
+        for station_file, source, info, df, messages in pool_map(safe_load_input, items, workers):
+            for msg in messages:
+                print(msg)
+            if df is None:
+                continue
+            METRICS.count("rows", len(df))
+            fields.append(station_fields(station_file, source, info))
+            frames.append(df[["dataTime", "dataValue"]])
+    if not fields:
+        return pd.DataFrame()
+    with METRICS.stage("batch stats"):
+        stats = batchEDA.station_stats(frames)
+    return pd.concat([pd.DataFrame(fields), stats], axis=1)
+
+ENGINES = {"station": run_station_engine, "batch": run_batch_engine}
+
+# ========= INCREMENTAL =========
+def input_key(item):
+    name = os.path.basename(item[1]) if item[0] == "excel" else item[1]
+    return f"{item[2]}/{name}"
+
+def input_fingerprint(item):
+    if item[0] == "excel":
+        # a Telemetry workbook read through its tiers gives (float32-rounded) monthly means, not raw rows
+        return file_fingerprint(item[1]) + ("+tiers" if item[4] and item[2] in TIERED_MODES else "")
+    return frame_fingerprint(item[3], item[4])
+
+def run_incremental(items, engine, workers, store, recompute=False):
+    """Run the engine on the stations whose input fingerprint changed; reuse stored rows for the rest.
+
+    Fingerprints are tagged with the engine, so rows the other engine computed are not reused.
+    Returns (summary frame, {input_key: fingerprint}) so later stages need not hash the inputs again.
+    """
+    keys, stale, fingerprints = [], [], {}
+    with METRICS.stage("fingerprint"):
+        for item in items:
+            key, fp = input_key(item), f"{engine}:{input_fingerprint(item)}"
+            keys.append(key)
+            fingerprints[key] = fp
+            if recompute or not store.fresh(key, fp):
+                stale.append((key, fp, item))
+    print(f"♻️ {len(keys) - len(stale)} stations unchanged, analysing {len(stale)}")
+    METRICS.count("reused", len(keys) - len(stale))
+    METRICS.count("recomputed", len(stale))
+
+    if stale:
+        fresh_df = ENGINES[engine]([item for _, _, item in stale], workers)
+        rows = {f"{r['source']}/{r['station_file']}": r for r in fresh_df.to_dict("records")}
+        for key, fp, _ in stale:
+            store.put(key, fp, rows.get(key))   # None: input gave no row, don't retry until it changes
+    store.prune(keys)
+    store.flush()
+    return pd.DataFrame([r for r in map(store.row, keys) if r is not None]), fingerprints
+
+# ========= DISTRICTS & PLOTS =========
+def summarise_districts(summary_df):
+    if summary_df.empty or not all(col in summary_df.columns for col in
+        ["district","station_file","trend_slope_m_per_year","anomaly_months","latest_anomaly"]):
+        return pd.DataFrame()
+    return summary_df.groupby("district").agg(
         n_stations=("station_file","count"),
         mean_slope=("trend_slope_m_per_year","mean"),
-        mean_anomalies=("anomaly_months","mean")
+        mean_anomalies=("anomaly_months","mean"),
+        anomalous_now=("latest_anomaly", lambda s: int(s.isin(["high","low"]).sum()))
     ).reset_index()
-    
-    district_summary.to_csv(os.path.join(OUTPUT_DIR,"district_summary.csv"), index=False)
-    print("✅ District summary saved:", os.path.join(OUTPUT_DIR,"district_summary.csv"))
-else:
-    print("⚠️ No valid data to create district summary.")
-    district_summary = pd.DataFrame()
-
-# ========= MAPS & PLOTS =========
-if not summary_df.empty:
-    if "lat" in summary_df.columns and "lon" in summary_df.columns:
-        plt.figure(figsize=(7,6))
-        sc = plt.scatter(summary_df["lon"], summary_df["lat"], 
-                         c=summary_df["trend_slope_m_per_year"], cmap="coolwarm", s=80)
-        plt.colorbar(sc, label="Trend slope (m/year)")
-        plt.title("Groundwater trend per station")
-        plt.xlabel("Longitude"); plt.ylabel("Latitude"); plt.grid(True)
-        plt.savefig(os.path.join(OUTPUT_DIR,"trend_map.png"), dpi=200)
-
-        plt.figure(figsize=(7,6))
-        sc = plt.scatter(summary_df["lon"], summary_df["lat"], 
-                         c=summary_df["anomaly_months"], cmap="plasma", s=80)
-        plt.colorbar(sc, label="Anomaly months")
-        plt.title("Groundwater anomalies per station")
-        plt.xlabel("Longitude"); plt.ylabel("Latitude"); plt.grid(True)
-        plt.savefig(os.path.join(OUTPUT_DIR,"anomaly_map.png"), dpi=200)
 
+def save_plots(summary_df, district_summary, output_dir):
+    if not summary_df.empty:
+        if "lat" in summary_df.columns and "lon" in summary_df.columns:
+            plt.figure(figsize=(7,6))
+            sc = plt.scatter(summary_df["lon"], summary_df["lat"],
+                             c=summary_df["trend_slope_m_per_year"], cmap="coolwarm", s=80)
+            plt.colorbar(sc, label="Trend slope (m/year)")
+            plt.title("Groundwater trend per station")
+            plt.xlabel("Longitude"); plt.ylabel("Latitude"); plt.grid(True)
+            plt.savefig(os.path.join(output_dir,"trend_map.png"), dpi=200)
+            plt.close()
+
+            plt.figure(figsize=(7,6))
+            sc = plt.scatter(summary_df["lon"], summary_df["lat"],
+                             c=summary_df["anomaly_months"], cmap="plasma", s=80)
+            plt.colorbar(sc, label="Anomaly months")
+            plt.title("Groundwater anomalies per station")
+            plt.xlabel("Longitude"); plt.ylabel("Latitude"); plt.grid(True)
+            plt.savefig(os.path.join(output_dir,"anomaly_map.png"), dpi=200)
+            plt.close()
+
+            # continuous IDW surfaces of the same two columns
+            spatial.save_idw_maps(summary_df, output_dir)
+
+        if not district_summary.empty:
+            plt.figure(figsize=(10,5))
+            district_summary.sort_values("mean_slope").plot(
+                x="district", y="mean_slope", kind="barh", legend=False, ax=plt.gca())
+            plt.xlabel("Mean slope (m/year)")
+            plt.title("Average groundwater trend per district")
+            plt.tight_layout()
+            plt.savefig(os.path.join(output_dir,"district_trend_barchart.png"), dpi=200)
+            plt.close()
+
+            plt.figure(figsize=(10,5))
+            district_summary.sort_values("mean_anomalies").plot(
+                x="district", y="mean_anomalies", kind="barh", legend=False, ax=plt.gca(), color="orange")
+            plt.xlabel("Mean anomaly months")
+            plt.title("Average groundwater anomalies per district")
+            plt.tight_layout()
+            plt.savefig(os.path.join(output_dir,"district_anomaly_barchart.png"), dpi=200)
+            plt.close()
+
+# ========= MAIN =========
+def main(base_dir=BASE_DIR, output_dir=None, storage=None, use_cache=True, workers=1, engine="station",
+         metrics_path=None, recompute=False, use_tiers=True, hydrographs=True):
+    output_dir = output_dir or os.path.join(base_dir, "outputs")
+    os.makedirs(output_dir, exist_ok=True)
+    storage = storage or detect_storage(base_dir)
+    print("📂 Reading", storage, "inputs from", base_dir, f"({engine} engine, {workers} worker(s))")
+
+    # ========= PROCESS FILES =========
+    items = list(LOADERS[storage](base_dir, use_cache, use_tiers))
+    with METRICS.stage(f"{engine} engine"), ResultsStore(os.path.join(base_dir, ".cache", "results.sqlite")) as store:
+        summary_df, fingerprints = run_incremental(items, engine, workers, store, recompute)
+    METRICS.count("stations", len(summary_df))
+
+    # ========= SAVE SUMMARIES =========
+
+    print("\n=== Debug Info ===")
+    print("Summary DF shape:", summary_df.shape)
+    print("Columns:", list(summary_df.columns))
+    print(summary_df.head(), "\n")
+
+    with METRICS.stage("write csv"):
+        summary_df.to_csv(os.path.join(output_dir,"station_summary.csv"), index=False)
+
+    # ========= DISTRICT SUMMARY =========
+    with METRICS.stage("district summary"):
+        district_summary = summarise_districts(summary_df)
     if not district_summary.empty:
-        plt.figure(figsize=(10,5))
-        district_summary.sort_values("mean_slope").plot(
-            x="district", y="mean_slope", kind="barh", legend=False, ax=plt.gca())
-        plt.xlabel("Mean slope (m/year)")
-        plt.title("Average groundwater trend per district")
-        plt.tight_layout()
-        plt.savefig(os.path.join(OUTPUT_DIR,"district_trend_barchart.png"), dpi=200)
-
-        plt.figure(figsize=(10,5))
-        district_summary.sort_values("mean_anomalies").plot(
-            x="district", y="mean_anomalies", kind="barh", legend=False, ax=plt.gca(), color="orange")
-        plt.xlabel("Mean anomaly months")
-        plt.title("Average groundwater anomalies per district")
-        plt.tight_layout()
-        plt.savefig(os.path.join(OUTPUT_DIR,"district_anomaly_barchart.png"), dpi=200)
-
-print("\n✅ Processing complete")
-print("Outputs saved in:", OUTPUT_DIR)
+        district_summary.to_csv(os.path.join(output_dir,"district_summary.csv"), index=False)
+        print("✅ District summary saved:", os.path.join(output_dir,"district_summary.csv"))
+    else:
+        print("⚠️ No valid data to create district summary.")
+
+    # ========= MAPS & PLOTS =========
+    with METRICS.stage("plots"):
+        save_plots(summary_df, district_summary, output_dir)
+
+    # ========= HYDROGRAPHS =========
+    if hydrographs:
+        with METRICS.stage("hydrographs"):
+            counts = plots.render(items, summary_df, output_dir, workers, fingerprints)
+        print(f"📈 Hydrographs: {counts['stations drawn']} stations drawn ({counts['stations unchanged']} unchanged),"
+              f" {counts['districts drawn']} district panels ->", os.path.join(output_dir, "hydrographs"))
+
+    print("\n✅ Processing complete")
+    print("Outputs saved in:", output_dir)
+    METRICS.report(metrics_path)
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Trend / anomaly analysis of downloaded groundwater levels.")
+    ap.add_argument("--base-dir", default=BASE_DIR, help="State folder written by getExcels.py")
+    ap.add_argument("--output-dir", default=None, help="Defaults to <base-dir>/outputs")
+    ap.add_argument("--storage", choices=sorted(LOADERS), default=None,
+                    help="Input backend (default: parquet if <base-dir>/dataset exists, else excel)")
+    ap.add_argument("--no-cache", action="store_true", help="Re-parse every workbook, ignoring <base-dir>/.cache")
+    ap.add_argument("--workers", type=int, default=1, help="Analyse stations on this many processes (1 = serial)")
+    ap.add_argument("--engine", choices=sorted(ENGINES), default="station",
+                    help="station: per-station DataFrames; batch: one long-format table for the whole state")
+    ap.add_argument("--no-tiers", action="store_true",
+                    help="Analyse Telemetry stations from raw readings instead of <base-dir>/tiers")
+    ap.add_argument("--no-hydrographs", action="store_true",
+                    help="Skip the per-station / per-district hydrographs in <output-dir>/hydrographs")
+    ap.add_argument("--recompute", action="store_true",
+                    help="Analyse every station again instead of reusing results of unchanged inputs")
+    ap.add_argument("--metrics", help="Also write the run metrics (stage times, rows, peak RSS) to this JSON file")
+    ap.add_argument("--profile", help="cProfile the run (main process only) into this .prof file and print the hot paths")
+    return ap.parse_args()
+
+def profiled(fn, path, top=25):
+    """Run fn() under cProfile, dump the stats to `path` and print the top functions by cumulative time."""
+    import cProfile, pstats
+    prof = cProfile.Profile()
+    try:
+        prof.runcall(fn)
+    finally:
+        prof.dump_stats(path)
+        print(f"\n🔥 Hot paths (full profile in {path}):")
+        pstats.Stats(prof).sort_stats("cumulative").print_stats(top)
+
+if __name__ == "__main__":
+    args = parse_args()
+    run = lambda: main(args.base_dir, args.output_dir, args.storage, use_cache=not args.no_cache,
+                       workers=args.workers, engine=args.engine, metrics_path=args.metrics,
+                       recompute=args.recompute, use_tiers=not args.no_tiers,
+                       hydrographs=not args.no_hydrographs)
+    if args.profile:
+        profiled(run, args.profile)
+    else:
+        run()
@@ -0,0 +1,76 @@
+"""Whole-state batch engine for EDA.py (--engine batch).
+
+Instead of one DataFrame + resample + linregress per station, every
+station's readings go into one long table (station, dataTime, dataValue).
+Monthly means come from a single grouped aggregation, and OLS slope,
+p-value, mean and seasonal anomalies (seasonal.py) are computed for all
+stations at once over the grouped arrays. Results follow EDA.station_summary: months with
+no readings count towards monthly_points but are skipped by the statistics.
+"""
+import numpy as np
+import pandas as pd
+
+import seasonal
+import trendStats
+
+
+def long_table(frames):
+    """(station, dataTime, dataValue) for all frames; station is the frame's position."""
+    lengths = [len(f) for f in frames]
+    if not frames:
+        return pd.DataFrame({"station": np.array([], dtype=np.int32),
+                             "dataTime": np.array([], dtype="datetime64[ns]"),
+                             "dataValue": np.array([], dtype=float)})
+    return pd.DataFrame({
+        "station": np.repeat(np.arange(len(frames), dtype=np.int32), lengths),
+        "dataTime": np.concatenate([f["dataTime"].to_numpy(dtype="datetime64[ns]") for f in frames]),
+        "dataValue": np.concatenate([f["dataValue"].to_numpy(dtype=float) for f in frames]),
+    })
+
+
+def monthly_means(long):
+    """Mean per (station, month index) for months with readings, sorted by station then month."""
+    t = long["dataTime"].dt
+    month = (t.year.to_numpy(dtype=np.int64) * 12 + t.month.to_numpy(dtype=np.int64) - 1)
+    grouped = long.groupby([long["station"].to_numpy(), month], sort=True)["dataValue"].mean()
+    return (grouped.index.get_level_values(0).to_numpy(),
+            grouped.index.get_level_values(1).to_numpy(),
+            grouped.to_numpy(dtype=float))
+
+
+def station_stats(frames):
+    """Statistic columns of the station summary, one row per frame (in order)."""
+    n = len(frames)
+    columns = (["monthly_points", "mean_level", "trend_slope_m_per_year", "trend_intercept_m", "trend_pval", "mk_pval"]
+               + seasonal.COLUMNS)
+    if n == 0:
+        return pd.DataFrame(columns=columns)
+
+    station, month, values = monthly_means(long_table(frames))
+    counts = np.bincount(station, minlength=n)
+    has = counts > 0
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    starts = offsets[has]
+
+    # months between first and last reading, like resample("M") would produce
+    span = np.zeros(n, dtype=np.int64)
+    span[has] = np.maximum.reduceat(month, starts) - np.minimum.reduceat(month, starts) + 1
+
+    mean = np.full(n, np.nan)
+    mean[has] = np.add.reduceat(values, starts) / counts[has]
+
+    slope = np.full(n, np.nan)
+    pval = np.full(n, np.nan)
+    slope[has], pval[has] = trendStats.ols_trend_grouped(values, starts)
+
+    mk = trendStats.mk_test_grouped(values, offsets)[2]
+
+    stats = pd.DataFrame({
+        "monthly_points": span,
+        "mean_level": mean,
+        "trend_slope_m_per_year": slope * 12,
+        "trend_intercept_m": mean - slope * (counts - 1) / 2,   # OLS line at x = 0, as EDA.trend_intercept
+        "trend_pval": pval,
+        "mk_pval": mk,
+    })
+    return pd.concat([stats, seasonal.station_anomalies(station, month, values, n)], axis=1)[columns]
@@ -0,0 +1,195 @@
+"""End-to-end pipeline benchmark on synthetic stations served by mockWris.
+
+    python benchmarks/pipeline.py [--stations 200] [--years 10] [--telemetry-share 0.2]
+                                  [--manual-freq 90D] [--telemetry-freq 6h]
+                                  [--latency 0.02] [--error-rate 0.02] [--workers 8] [--json out.json]
+
+Stages: download (getExcels.main against the mock, then an incremental
+rerun that refetches station metadata, i.e. the tail sync, and one served
+from the metadata cache), storage (station writers per backend, no network) and each EDA.py
+step over the downloaded dataset (ingest, resample, trend, mk, engines,
+aggregation, plotting).
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import pandas as pd  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import EDA  # noqa: E402
+import getExcels  # noqa: E402
+from metrics import METRICS  # noqa: E402
+from mockWris import MockWris, synthetic_catalog, synthetic_station  # noqa: E402
+from storage import open_store  # noqa: E402
+
+STATE = "Bench State"
+
+
+class Timer:
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.s = time.perf_counter() - self.t0
+
+
+def quiet():
+    return contextlib.redirect_stdout(open(os.devnull, "w"))
+
+
+def generate(args):
+    catalog = synthetic_catalog(args.stations, districts=args.districts,
+                                telemetry_share=args.telemetry_share, seed=args.seed)
+    end = pd.Timestamp("2024-12-31")
+    start = (end - pd.DateOffset(years=args.years) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    series = {}
+    for st in catalog:
+        freq = args.telemetry_freq if st["mode"] == "Telemetry" else args.manual_freq
+        series[st["station_id"]] = synthetic_station(st["station_id"], start=start, end=end, freq=freq)
+    return catalog, series
+
+
+def bench_download(args, catalog, series, workdir):
+    with open(os.path.join(workdir, f"{getExcels.safe(STATE)}_Stations.json"), "w", encoding="utf-8") as f:
+        json.dump(catalog, f)
+    rows = sum(len(records) for _, records in series.values())
+    out = {"rows": rows}
+    with MockWris(series, latency=args.latency, error_rate=args.error_rate, seed=args.seed) as mock:
+        # meta_ttl=0: within the TTL a rerun is answered from the metadata cache without a request
+        for run, meta_ttl in (("full", 0), ("incremental", 0), ("cached", getExcels.META_TTL)):
+            mock.requests.clear()
+            METRICS.reset()
+            with Timer() as t, quiet():
+                getExcels.main(STATE, workers=args.workers, rate=args.rate, base_url=mock.base_url,
+                               meta_ttl=meta_ttl)
+            out[run] = {"seconds": t.s, "requests": len(mock.requests),
+                        "stations_per_s": len(catalog) / t.s, "metrics": METRICS.snapshot()}
+        out["full"]["rows_per_s"] = rows / out["full"]["seconds"]
+    return out
+
+
+def bench_storage(args, catalog, series, workdir):
+    out = {}
+    frames = []
+    for st in catalog:
+        meta, records = series[st["station_id"]]
+        df = pd.DataFrame(records)
+        df["dataTime"] = pd.to_datetime(df["dataTime"])
+        frames.append((st, meta, df))
+    rows = sum(len(df) for _, _, df in frames)
+    for name in args.storage:
+        folder = os.path.join(workdir, f"storage-{name}")
+        store = open_store(name, folder, STATE)
+        with Timer() as t:
+            for st, meta, df in frames:
+                with store.writer(st, meta) as w:
+                    w.write(df)
+            store.close()
+        out[name] = {"seconds": t.s, "rows_per_s": rows / t.s, "stations_per_s": len(frames) / t.s}
+    return out
+
+
+def bench_eda(args, base_dir):
+    out = {}
+    with Timer() as t:
+        items = list(EDA.LOADERS["parquet"](base_dir, False))
+        loaded = [EDA.load_input(item) for item in items]
+    out["ingest"] = t.s
+    frames = [(f, s, info, df) for f, s, info, df, _ in loaded if df is not None]
+
+    with Timer() as t:
+        monthly = [df.set_index("dataTime").resample("M").mean(numeric_only=True)["dataValue"]
+                   for _, _, _, df in frames]
+    out["resample"] = t.s
+    with Timer() as t:
+        for m in monthly:
+            EDA.trend_info(m)
+    out["trend"] = t.s
+    with Timer() as t:
+        for m in monthly:
+            EDA.mann_kendall_test(m)
+    out["mk"] = t.s
+
+    for engine in sorted(EDA.ENGINES):
+        with Timer() as t, quiet():
+            summary_df = EDA.ENGINES[engine](items, args.workers if engine == "station" else 1)
+        out[f"{engine}_engine"] = t.s
+
+    with Timer() as t:
+        district_summary = EDA.summarise_districts(summary_df)
+    out["aggregation"] = t.s
+
+    plot_dir = os.path.join(base_dir, "outputs")
+    os.makedirs(plot_dir, exist_ok=True)
+    with Timer() as t:
+        EDA.save_plots(summary_df, district_summary, plot_dir)
+        matplotlib.pyplot.close("all")
+    out["plotting"] = t.s
+    out["stations"] = len(frames)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stations", type=int, default=200)
+    ap.add_argument("--districts", type=int, default=10)
+    ap.add_argument("--years", type=int, default=10)
+    ap.add_argument("--telemetry-share", type=float, default=0.2)
+    ap.add_argument("--manual-freq", default="90D", help="Sampling of manual stations (pandas offset)")
+    ap.add_argument("--telemetry-freq", default="6h", help="Sampling of telemetry stations (pandas offset)")
+    ap.add_argument("--latency", type=float, default=0.02, help="Mock seconds per request")
+    ap.add_argument("--error-rate", type=float, default=0.02, help="Mock share of 503/429 responses")
+    ap.add_argument("--workers", type=int, default=8, help="Download threads / EDA processes")
+    ap.add_argument("--rate", type=float, default=0, help="Downloader requests/second (0 = unlimited)")
+    ap.add_argument("--storage", nargs="+", default=["parquet", "excel"])
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workdir", help="Keep generated files here instead of a temp folder")
+    ap.add_argument("--json", help="Write results to this file")
+    args = ap.parse_args()
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="wris-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+    cwd = os.getcwd()
+    results = {"config": vars(args), "python": platform.python_version(), "cpus": os.cpu_count()}
+    try:
+        with Timer() as t:
+            catalog, series = generate(args)
+        results["generate_s"] = t.s
+        os.chdir(workdir)
+        results["download"] = bench_download(args, catalog, series, workdir)
+        results["storage"] = bench_storage(args, catalog, series, workdir)
+        results["eda"] = bench_eda(args, os.path.join(workdir, STATE))
+    finally:
+        os.chdir(cwd)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    d = results["download"]
+    print(f"{args.stations} stations, {d['rows']} readings ({args.years} years)")
+    print(f"download    full {d['full']['seconds']:8.2f}s  {d['full']['stations_per_s']:8.1f} st/s "
+          f"{d['full']['rows_per_s']:10.0f} rows/s  {d['full']['requests']} requests")
+    print(f"download    incr {d['incremental']['seconds']:8.2f}s  {d['incremental']['requests']} requests")
+    print(f"download  cached {d['cached']['seconds']:8.2f}s  {d['cached']['requests']} requests (metadata cache)")
+    for name, s in results["storage"].items():
+        print(f"storage {name:>8} {s['seconds']:8.2f}s  {s['rows_per_s']:10.0f} rows/s")
+    for stage, s in results["eda"].items():
+        if stage != "stations":
+            print(f"eda {stage:>14} {s:8.3f}s")
+
+    if args.json:
+        with open(os.path.join(cwd, args.json) if not os.path.isabs(args.json) else args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark trendStats against the original pairwise Mann-Kendall / linregress code.
+
+    python benchmarks/trend_stats.py [--sizes 60 240 1200 5000] [--stations 2000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.stats import linregress, norm
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import trendStats  # noqa: E402
+
+
+def mann_kendall_pairwise(x):
+    """The EDA.py implementation this module replaced (O(n^2), no tie correction)."""
+    n = len(x)
+    if n < 3: return np.nan
+    s = sum(np.sign(x[j]-x[i]) for i in range(n-1) for j in range(i+1,n))
+    var_s = (n*(n-1)*(2*n+5))/18
+    z = (s-1 if s>0 else s+1 if s<0 else 0)/np.sqrt(var_s)
+    return 2*(1 - norm.cdf(abs(z)))
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[60, 240, 1200, 5000])
+    ap.add_argument("--stations", type=int, default=2000, help="Stations in the batch run")
+    ap.add_argument("--months", type=int, default=240, help="Series length in the batch run")
+    ap.add_argument("--pairwise-max", type=int, default=1200, help="Skip the O(n^2) baseline above this n")
+    ap.add_argument("--json", help="Write results to this file")
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(42)
+    results = {"single": [], "batch": {}}
+
+    for n in args.sizes:
+        x = np.cumsum(rng.normal(size=n))   # tie-free
+        row = {"n": n}
+        row["mk_fast_s"], p_fast = timed(trendStats.mk_test, x)
+        if n <= args.pairwise_max:
+            row["mk_pairwise_s"], p_old = timed(mann_kendall_pairwise, x, repeat=1)
+            row["mk_match"] = bool(np.isclose(p_fast[2], p_old, rtol=0, atol=1e-12))
+            row["mk_speedup"] = row["mk_pairwise_s"] / row["mk_fast_s"]
+        row["sens_s"], _ = timed(trendStats.sens_slope, x)
+        row["ols_s"], _ = timed(trendStats.ols_trend, x)
+        row["linregress_s"], _ = timed(linregress, np.arange(n), x)
+        results["single"].append(row)
+
+    series = {i: np.cumsum(rng.normal(size=args.months)) for i in range(args.stations)}
+    results["batch"]["stations"] = args.stations
+    results["batch"]["months"] = args.months
+    results["batch"]["trend_batch_s"], _ = timed(trendStats.trend_batch, series, repeat=1)
+    t0 = time.perf_counter()
+    for a in series.values():
+        linregress(np.arange(len(a)), a)
+        if args.months <= args.pairwise_max:
+            mann_kendall_pairwise(a)
+    results["batch"]["per_station_original_s"] = time.perf_counter() - t0
+
+    print(f"{'n':>6} {'MK fast':>10} {'MK pairwise':>12} {'speedup':>9} {'match':>6} {'Sen':>10}")
+    for r in results["single"]:
+        print(f"{r['n']:>6} {r['mk_fast_s']:>10.5f} {r.get('mk_pairwise_s', float('nan')):>12.5f} "
+              f"{r.get('mk_speedup', float('nan')):>9.1f} {str(r.get('mk_match', '-')):>6} {r['sens_s']:>10.5f}")
+    b = results["batch"]
+    print(f"\nBatch of {b['stations']} x {b['months']} months: trend_batch {b['trend_batch_s']:.2f}s "
+          f"vs original loop {b['per_station_original_s']:.2f}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Streaming station catalog shared by getAllStationsOfAState.py and getExcels.py.
+
+While scraping, every finished (district occurrence, tehsil, block, agency,
+mode) leaf is appended as one JSON line to <State>_Stations.parts/<writer>.jsonl
+(one file per browser/shard, so writers never share a file):
+
+    {"district_index": 3, "key": [district, occurrence, tehsil, block, agency, mode], "stations": [...]}
+
+A line is only written once its leaf is complete, so the lines double as
+the checkpoint: a restarted run skips every key already present. A line
+with "complete": true marks a whole district occurrence as done, and a
+{"finished": true} line marks the end of the scrape. compact() merges the
+parts into the usual deduplicated <State>_Stations.json. A scrape that dies
+leaves failed.json in the parts folder instead, so followers stop waiting;
+the resumed scrape removes it.
+
+WRIS lists some stations under several district/tehsil/block/agency paths
+(the same station_id each time). normalize() keeps one record per
+station_id, the first path scraped, and lists the other paths in its
+"aliases", so each station is downloaded and stored once; alias_records()
+and query.py resolve the other paths back to it.
+"""
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+from storage import safe
+
+FOLLOW_IDLE = 30 * 60   # seconds follow_stations waits for a new line before giving up on the scraper
+
+
+def catalog_path(state_name):
+    return Path(f"{safe(state_name)}_Stations.json")
+
+
+def parts_dir(state_name):
+    return Path(f"{safe(state_name)}_Stations.parts")
+
+
+class CatalogWriter:
+    def __init__(self, state_name, writer="main"):
+        folder = parts_dir(state_name)
+        folder.mkdir(parents=True, exist_ok=True)
+        self.path = folder / f"{writer}.jsonl"
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    def _write(self, entry):
+        self._fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def add(self, district_index, key, stations):
+        self._write({"district_index": district_index, "key": list(key), "stations": stations})
+
+    def complete_district(self, district_index, dname, occurrence):
+        self._write({"district_index": district_index, "key": [dname, occurrence], "complete": True, "stations": []})
+
+    def finish(self):
+        self._write({"finished": True})
+
+    def close(self):
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_entries(state_name):
+    """All catalog lines from every part file, in file order (torn lines skipped)."""
+    entries = []
+    folder = parts_dir(state_name)
+    if not folder.exists():
+        return entries
+    for part in sorted(folder.glob("*.jsonl")):
+        with open(part, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    return entries
+
+
+def done_keys(state_name):
+    """Keys of completed leaves and district occurrences, as tuples."""
+    return {tuple(e["key"]) for e in read_entries(state_name) if "key" in e}
+
+
+def is_finished(state_name):
+    return any(e.get("finished") for e in read_entries(state_name))
+
+
+def record_key(st):
+    return (st.get("district"), st.get("tehsil"), st.get("block"), st.get("agency"),
+            st.get("mode"), st.get("station_id"), st.get("station_name"))
+
+
+PATH_FIELDS = ("district", "tehsil", "block", "agency", "station_name")
+
+
+def station_key(st):
+    """Identity of a station: its station_id, or the whole record when the scrape got none."""
+    return ("id", str(st["station_id"]).strip()) if st.get("station_id") else record_key(st)
+
+
+def normalize(records):
+    """One record per station_id, in first-seen order; other paths of it go to "aliases"."""
+    index = {}
+    for st in records:
+        key = station_key(st)
+        first = index.get(key)
+        if first is None:
+            index[key] = {k: v for k, v in st.items() if k != "aliases"}
+            first = index[key]
+        for alias in [st] + list(st.get("aliases", [])):
+            path = {k: alias.get(k) for k in PATH_FIELDS}
+            if path != {k: first.get(k) for k in PATH_FIELDS} and path not in first.get("aliases", []):
+                first.setdefault("aliases", []).append(path)
+    return list(index.values())
+
+
+def alias_records(st):
+    """The station as it was listed under each of its alias paths (for files named after them)."""
+    base = {k: v for k, v in st.items() if k != "aliases"}
+    return [{**base, **path} for path in st.get("aliases", [])]
+
+
+def compact(state_name):
+    """Write the deduplicated <State>_Stations.json from the parts; returns the station count.
+
+    Leaves are ordered by district index; a leaf scraped twice (e.g. after
+    a crash between runs) keeps its latest result.
+    """
+    leaves = {}
+    for seq, e in enumerate(read_entries(state_name)):
+        if "stations" in e and not e.get("complete"):
+            leaves[tuple(e["key"])] = (e["district_index"], seq, e["stations"])
+
+    stations = normalize(st for _, _, records in sorted(leaves.values(), key=lambda v: (v[0], v[1]))
+                         for st in records)
+
+    out = catalog_path(state_name)
+    tmp = out.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(stations, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, out)
+    return len(stations)
+
+
+def failure_path(state_name):
+    return parts_dir(state_name) / "failed.json"
+
+
+def mark_failed(state_name, error):
+    folder = parts_dir(state_name)
+    folder.mkdir(parents=True, exist_ok=True)
+    with open(failure_path(state_name), "w", encoding="utf-8") as f:
+        json.dump({"error": str(error), "at": time.time()}, f, ensure_ascii=False)
+
+
+def clear_failure(state_name):
+    failure_path(state_name).unlink(missing_ok=True)
+
+
+def failure(state_name):
+    """The failure marker's {"error", "at"} if the last scrape died, else None."""
+    try:
+        with open(failure_path(state_name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def reset(state_name):
+    shutil.rmtree(parts_dir(state_name), ignore_errors=True)
+
+
+def load_stations(state_name):
+    """Normalized catalog records: the compacted JSON if present, else whatever the parts hold so far."""
+    path = catalog_path(state_name)
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            return normalize(json.load(f))   # catalogs compacted before normalize() may repeat stations
+    return normalize(st for e in read_entries(state_name) for st in e.get("stations", []))
+
+
+def follow_stations(state_name, poll=2.0, idle=FOLLOW_IDLE):
+    """Yield catalog records as the scraper appends them, until it writes its finished marker.
+
+    Also stops when the scraper leaves a failure marker, or when no line
+    arrives for `idle` seconds (None waits forever). A station listed again
+    under another path is not yielded twice; its aliases are only known once
+    the catalog is compacted.
+    """
+    offsets, seen = {}, set()
+    folder = parts_dir(state_name)
+    last_line = time.monotonic()
+    while True:
+        finished = False
+        for part in sorted(folder.glob("*.jsonl")) if folder.exists() else []:
+            with open(part, "r", encoding="utf-8") as f:
+                f.seek(offsets.get(part, 0))
+                while True:
+                    line = f.readline()
+                    if not line.endswith("\n"):
+                        break   # partial line: re-read it on the next poll
+                    offsets[part] = f.tell()
+                    last_line = time.monotonic()
+                    try:
+                        e = json.loads(line)
+                    except ValueError:
+                        continue
+                    finished = finished or bool(e.get("finished"))
+                    for st in e.get("stations", []):
+                        if station_key(st) not in seen:
+                            seen.add(station_key(st))
+                            yield st
+        if finished:
+            return
+        failed = failure(state_name)
+        if failed is not None:
+            print(f"❌ Catalogue scrape failed ({failed['error']}); stopped following {state_name}")
+            return
+        if idle is not None and time.monotonic() - last_line > idle:
+            print(f"⚠️ No catalogue progress for {idle:.0f}s; stopped following {state_name}")
+            return
+        time.sleep(poll)
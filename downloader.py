@@ -0,0 +1,363 @@
+import random
+import threading
+import time
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+
+from metrics import METRICS
+
+try:
+    import ijson   # optional: parse data responses without materialising the JSON document
+except ImportError:
+    ijson = None
+
+# -------------------
+# ENDPOINTS
+# -------------------
+BASE_URL = "https://indiawris.gov.in"
+META_PATH = "/stationMaster/getMasterStationsList"
+DATA_PATH = "/CommonDataSetMasterAPI/getCommonDataSetByStationCode"
+
+# Responses worth retrying; everything else in 4xx is a real failure
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Time windows for data requests: sized so each response holds about
+# WINDOW_ROWS readings, learned from the rows/day of earlier windows
+WINDOW_ROWS = 20000
+FIRST_WINDOW_DAYS = 365
+MIN_WINDOW_DAYS = 1
+MAX_WINDOW_DAYS = 36500
+
+_END = object()
+
+JSON_ERRORS = (ijson.JSONError,) if ijson is not None else ()
+NAT = np.iinfo(np.int64).min   # int64 value of NaT
+
+
+def timed_out(e):
+    """True for request timeouts, including a read timeout while streaming the body.
+
+    requests reports the latter as a ConnectionError wrapping urllib3's
+    ReadTimeoutError, not as requests.Timeout.
+    """
+    return isinstance(e, requests.Timeout) or any(
+        isinstance(a, (ReadTimeoutError, TimeoutError)) for a in getattr(e, "args", ()))
+
+
+def time_ns(value):
+    """int64 nanoseconds of a dataTime value (NAT if missing or unparseable)."""
+    if value is None:
+        return NAT
+    try:
+        return int(np.datetime64(value, "ns").astype(np.int64))   # ISO strings, the WRIS format
+    except (TypeError, ValueError):
+        ts = pd.to_datetime(value, errors="coerce")
+        return NAT if pd.isna(ts) else int(ts.value)
+
+
+def window_days(rows_per_day):
+    """Days per data request for about WINDOW_ROWS readings."""
+    if rows_per_day <= 0:
+        return MAX_WINDOW_DAYS
+    return int(min(MAX_WINDOW_DAYS, max(MIN_WINDOW_DAYS, WINDOW_ROWS / rows_per_day)))
+
+
+class FetchError(Exception):
+    """Raised when a WRIS request fails after all retries or returns no data."""
+
+
+# -------------------
+# RATE LIMITING
+# -------------------
+class RateLimiter:
+    """Token bucket per host: `rate` requests/second with bursts up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate))
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(host, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last) * self.rate)
+                if tokens >= 1:
+                    self._buckets[host] = (tokens - 1, now)
+                    return
+                self._buckets[host] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+
+# -------------------
+# STREAMING RESPONSES
+# -------------------
+class ColumnBuffer:
+    """Readings of one data window, held column by column.
+
+    dataValue and dataTime go into float64 / int64 (nanosecond) arrays as
+    records arrive; the other fields cost one list slot per reading rather
+    than one dict per reading.
+    """
+    TYPED = ("dataTime", "dataValue")
+
+    def __init__(self):
+        self.columns = {}           # field -> list, in first-seen order (TYPED fields -> None)
+        self.values = array("d")
+        self.times = array("q")
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, record):
+        for key, value in record.items():
+            if key in self.TYPED:
+                self.columns.setdefault(key, None)
+                continue
+            col = self.columns.get(key)
+            if col is None:
+                col = self.columns[key] = [None] * self.count
+            col.append(value)
+        value = record.get("dataValue")
+        try:
+            self.values.append(float(value))
+        except (TypeError, ValueError):
+            self.values.append(float("nan"))
+        self.times.append(time_ns(record.get("dataTime")))
+        self.count += 1
+        for col in self.columns.values():
+            if col is not None and len(col) < self.count:
+                col.append(None)
+
+    def to_frame(self):
+        """DataFrame like pd.DataFrame(records), with dataTime parsed."""
+        typed = {"dataValue": np.frombuffer(self.values, dtype=np.float64),
+                 "dataTime": np.frombuffer(self.times, dtype=np.int64).view("datetime64[ns]")}
+        return pd.DataFrame({k: (typed[k] if v is None else v) for k, v in self.columns.items()})
+
+
+class _ChunkReader:
+    """File-like view of a streamed response body, for ijson."""
+
+    def __init__(self, resp, chunk_size=65536):
+        self._chunks = resp.iter_content(chunk_size)
+        self._pending = b""
+
+    def read(self, n=-1):
+        if n == 0:
+            return b""
+        data = self._pending or next(self._chunks, b"")
+        if 0 < n < len(data):
+            data, self._pending = data[:n], data[n:]
+        else:
+            self._pending = b""
+        return data
+
+
+def parse_data_response(resp):
+    """(statusCode, ColumnBuffer) from a getCommonDataSetByStationCode response.
+
+    With ijson the body is parsed as it arrives; without it the document is
+    decoded whole, which still keeps memory to one window at a time.
+    """
+    buf = ColumnBuffer()
+    if ijson is None:
+        body = resp.json()
+        for record in body.get("data") or []:
+            buf.append(record)
+        return body.get("statusCode"), buf
+
+    status, builder = None, None
+    for prefix, event, value in ijson.parse(_ChunkReader(resp), use_float=True):
+        if prefix == "statusCode":
+            status = value
+        elif prefix == "data.item" and event == "start_map":
+            builder = ijson.ObjectBuilder()
+        if builder is not None and prefix.startswith("data.item"):
+            builder.event(event, value)
+            if prefix == "data.item" and event == "end_map":
+                buf.append(builder.value)
+                builder = None
+    return status, buf
+
+
+# -------------------
+# DOWNLOADER
+# -------------------
+class Downloader:
+    """Shared keep-alive session + bounded thread pool for the two WRIS endpoints.
+
+    Requests for one station stay ordered (metadata, then data) because they
+    run inside the same job; many stations run at once across `workers` threads.
+    """
+
+    def __init__(self, base_url=BASE_URL, workers=8, rate=5.0, retries=4,
+                 backoff=1.0, headers=None, dataset="GWATERLVL", limiter=None):
+        self.base_url = base_url.rstrip("/")
+        self.workers = max(1, int(workers))
+        self.retries = retries
+        self.backoff = backoff
+        self.dataset = dataset
+        self.limiter = limiter or RateLimiter(rate)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def post(self, path, payload, timeout=30, parse=None, stream=False, retry_timeouts=True):
+        """POST JSON with rate limiting and exponential backoff.
+
+        Returns the decoded body, or parse(response) when given (with
+        stream=True the body is read inside parse, so a body that breaks off
+        halfway is retried like any other failed request). With
+        retry_timeouts=False a read timeout fails at once, for callers that
+        would rather ask for less; connect timeouts are always retried.
+        """
+        url = self.base_url + path
+        host = urlparse(url).netloc
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire(host)
+            t0, resp = time.perf_counter(), None
+            try:
+                with self.session.post(url, json=payload, timeout=timeout, stream=stream) as resp:
+                    if resp.status_code in RETRY_STATUS:
+                        raise requests.HTTPError(f"HTTP {resp.status_code}", response=resp)
+                    resp.raise_for_status()
+                    return parse(resp) if parse else resp.json()
+            except (requests.RequestException, ValueError) + JSON_ERRORS as e:
+                # RequestException covers bodies cut off mid-stream (ChunkedEncodingError) too
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if status is not None and status not in RETRY_STATUS:
+                    raise FetchError(f"{path}: {e}") from e
+                if timed_out(e) and not isinstance(e, requests.Timeout):
+                    e = requests.ReadTimeout(e, request=getattr(e, "request", None))
+                if attempt == self.retries or (not retry_timeouts and isinstance(e, requests.ReadTimeout)):
+                    raise FetchError(f"{path}: {e} (after {attempt + 1} attempts)") from e
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+            finally:
+                nbytes = getattr(resp.raw, "tell", lambda: 0)() if resp is not None else 0
+                METRICS.observe_http(path, time.perf_counter() - t0, nbytes,
+                                     resp.status_code if resp is not None else None)
+
+    def fetch_meta(self, station_id):
+        """Station metadata dict from getMasterStationsList."""
+        meta = self.post(META_PATH, {"stationcode": station_id, "datasetcode": self.dataset}, timeout=30)
+        if meta.get("statusCode") != 200 or not meta.get("data"):
+            raise FetchError(f"Metadata fetch failed: {meta}")
+        return meta["data"][0]
+
+    def fetch_window(self, station_id, start, end, retry_timeouts=True):
+        """ColumnBuffer of the readings between two dates (inclusive), streamed."""
+        payload = {
+            "station_code": station_id,
+            "starttime": start,
+            "endtime": end,
+            "dataset": self.dataset
+        }
+        status, buf = self.post(DATA_PATH, payload, timeout=60, parse=parse_data_response,
+                                stream=True, retry_timeouts=retry_timeouts)
+        if status not in (200, 404):
+            raise FetchError(f"Data fetch failed: statusCode {status} for {start}..{end}")
+        return buf
+
+    def fetch_data_chunks(self, station_id, start, end, allow_empty=False, rows_per_day=None):
+        """Yield the readings of [start, end] as DataFrames, one time window at a time.
+
+        Windows are sized for about WINDOW_ROWS readings from the rows/day of
+        the previous window (or `rows_per_day`, e.g. from the sync manifest),
+        so a long telemetry history never sits in memory at once. A window
+        whose answer times out (a read timeout) is split in half and retried, and later windows stay
+        below the size that timed out.
+        allow_empty=True is for tail windows, where no new readings is normal.
+        """
+        start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+        days = window_days(rows_per_day) if rows_per_day else FIRST_WINDOW_DAYS
+        ceiling = MAX_WINDOW_DAYS
+        last, total = None, 0
+        while start <= end:
+            stop = min(end, start + pd.Timedelta(days=days - 1))
+            try:
+                buf = self.fetch_window(station_id, start.strftime("%Y-%m-%d"), stop.strftime("%Y-%m-%d"),
+                                        retry_timeouts=days <= MIN_WINDOW_DAYS)
+            except FetchError as e:
+                # only a slow answer says the window is too big; a connect timeout is the host, not the size
+                if days > MIN_WINDOW_DAYS and isinstance(e.__cause__, requests.ReadTimeout):
+                    days = ceiling = max(MIN_WINDOW_DAYS, days // 2)
+                    continue
+                raise
+
+            df = buf.to_frame()
+            if last is not None and "dataTime" in df.columns:
+                df = df[df["dataTime"] > last]
+            if not df.empty:
+                if "dataTime" in df.columns:
+                    last = df["dataTime"].max()
+                total += len(df)
+                yield df
+
+            days = min(ceiling, window_days(len(buf) / ((stop - start).days + 1)))
+            start = stop + pd.Timedelta(days=1)
+
+        if total == 0 and not allow_empty:
+            raise FetchError(f"Data fetch failed: no readings for {station_id}")
+
+    def fetch_data(self, station_id, start, end, allow_empty=False):
+        """All readings between two dates as one DataFrame (see fetch_data_chunks)."""
+        chunks = list(self.fetch_data_chunks(station_id, start, end, allow_empty))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+    def map(self, job, items):
+        """Run job(item) on the pool, yielding (item, result, error) as jobs finish.
+
+        `items` may be a generator that is still producing (e.g. a catalog
+        being scraped): at most 2 * workers jobs are in flight, and new items
+        are pulled only as earlier jobs complete.
+        """
+        items = iter(items)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = {}
+
+            def fill():
+                while len(pending) < 2 * self.workers:
+                    item = next(items, _END)
+                    if item is _END:
+                        return
+                    pending[pool.submit(job, item)] = item
+
+            fill()
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    item = pending.pop(fut)
+                    try:
+                        result = fut.result()
+                    except Exception as e:
+                        yield item, None, e
+                    else:
+                        yield item, result, None
+                fill()
@@ -1,17 +1,75 @@
-import json
+import argparse
+import multiprocessing
 import time
-from pathlib import Path
+import traceback
+import weakref
+from concurrent.futures import ProcessPoolExecutor
 from playwright.sync_api import sync_playwright
 
-def safe(s: str) -> str:
-    """Sanitize text for filenames: spaces -> _, / and \ -> -"""
-    return str(s).replace("/", "-").replace("\\", "-").replace(" ", "_")
-	
+import catalog
+from hierarchyCache import HierarchyCache, tree_path
+from metrics import METRICS
+
 
 DATASET_NAME = "Ground Water Level"
-STATE_NAME = input("State Name (default: Andhra Pradesh): ").strip() or "Andhra Pradesh"
-OUTFILE = Path(f"{safe(STATE_NAME)}_Stations.json")
+DEFAULT_STATE = "Andhra Pradesh"
 MODES = ["Telemetry", "Manual"]
+DISCOVERY = "network"   # "network": read station lists from the app's XHR JSON; "dom": click every station
+SHARDS = 1              # Parallel headless browsers; the district list is split between them
+OPTION_TIMEOUT = 3000   # ms to wait at most for a dependent dropdown to refresh after its parent changes
+OPTION_SETTLE = 250     # ms a dropdown's options must stay the same, with no XHR in flight, to count as loaded
+
+
+def option_texts(container):
+    """Current option labels of a multiselect (read from the DOM, open or not)."""
+    return [t.strip() for t in container.locator("li.multiselect-item-checkbox").all_text_contents()]
+
+
+class RequestTracker:
+    """Number of the page's XHR/fetch requests still in flight (see track_requests)."""
+
+    def __init__(self, page):
+        self.inflight = 0
+        page.on("request", lambda r: self._count(r, 1))
+        page.on("requestfinished", lambda r: self._count(r, -1))
+        page.on("requestfailed", lambda r: self._count(r, -1))
+
+    def _count(self, request, step):
+        if request.resource_type in ("xhr", "fetch"):
+            self.inflight = max(0, self.inflight + step)
+
+
+_TRACKERS = weakref.WeakKeyDictionary()
+
+
+def track_requests(page):
+    _TRACKERS[page] = RequestTracker(page)
+
+
+def wait_for_options(page, container, before, timeout=OPTION_TIMEOUT):
+    """Wait until a dropdown has reloaded after its parent changed; returns its options.
+
+    `before` is the list read before the parent changed. The options count as
+    loaded once they are non-empty and have not changed for OPTION_SETTLE ms;
+    a cleared list mid-refresh never qualifies. With the page's requests
+    tracked, no XHR may be in flight either, and a list equal to `before`
+    (a block whose only agency is the same as the last one's) is accepted
+    too; untracked, that case waits for the timeout. An empty list is only
+    returned at the timeout.
+    """
+    tracker = _TRACKERS.get(page)
+    deadline = time.monotonic() + timeout / 1000
+    last, since = None, time.monotonic()
+    with METRICS.stage("wait for options"):
+        while True:
+            now = option_texts(container)
+            if now != last:
+                last, since = now, time.monotonic()
+            settled = (bool(now) and time.monotonic() - since >= OPTION_SETTLE / 1000
+                       and (tracker.inflight == 0 if tracker is not None else now != before))
+            if settled or time.monotonic() >= deadline:
+                return now
+            page.wait_for_timeout(50)
 
 def click_option_by_text(container, btn, option_name):
     btn.click()
@@ -54,9 +112,118 @@ def reset_dropdown(container, btn, label):
             print(f"   🔄 Reset {label}")
             break
     btn.click()
-    time.sleep(0.7)
 
 
+# -------------------
+# NETWORK DISCOVERY
+# -------------------
+def norm_key(k):
+    return str(k).replace("_", "").replace(" ", "").lower()
+
+
+CODE_KEYS = {"stationcode"}
+NAME_KEYS = {"stationname"}
+ID_KEYS = {"stationid", "id", "value"}
+
+
+def extract_stations(payload):
+    """Station records found anywhere in a JSON payload.
+
+    Any list of objects carrying a station code and name is taken as a
+    station list; returns [{"station_id", "station_code", "station_name"}].
+    """
+    found = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            for v in node.values():
+                walk(v)
+        elif isinstance(node, list):
+            rows = [x for x in node if isinstance(x, dict)]
+            keyed = [{norm_key(k): v for k, v in x.items()} for x in rows]
+            if keyed and all(CODE_KEYS & k.keys() and NAME_KEYS & k.keys() for k in keyed):
+                for k in keyed:
+                    code = next(k[c] for c in CODE_KEYS if c in k)
+                    ident = next((k[c] for c in ID_KEYS if c in k), None)
+                    found.append({
+                        "station_id": str(code).strip() if code is not None else None,
+                        "station_code": str(ident) if ident is not None else None,
+                        "station_name": str(next(k[c] for c in NAME_KEYS if c in k)).strip(),
+                    })
+            else:
+                for x in node:
+                    walk(x)
+
+    walk(payload)
+    return found
+
+
+class ResponseCapture:
+    """Collects the JSON XHR/fetch responses the WRIS Angular app makes.
+
+    The handler only queues Response objects; bodies are read later from
+    the main flow in drain(), never inside the event callback.
+    """
+
+    def __init__(self, page):
+        self.pending = []
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        if response.request.resource_type not in ("xhr", "fetch"):
+            return
+        if "json" not in (response.headers.get("content-type") or ""):
+            return
+        self.pending.append(response)
+
+    def drain(self):
+        """[(url, payload)] for responses since the last drain."""
+        responses, self.pending = self.pending, []
+        out = []
+        for resp in responses:
+            try:
+                out.append((resp.url, resp.json()))
+            except Exception:
+                continue
+        return out
+
+
+def fetch_stations_from_network(page, capture, dname, tname, bname, aname, mode):
+    """Station records for the current selection, read from the captured station-list JSON.
+
+    Call after selecting `mode`; returns None when no station list was seen,
+    so the caller can fall back to the DOM walk.
+    """
+    try:
+        page.wait_for_load_state("networkidle", timeout=10000)
+    except Exception:
+        pass
+
+    stations = None
+    for url, payload in capture.drain():
+        found = extract_stations(payload)
+        if found:
+            stations = found   # the latest list wins
+    if stations is None:
+        return None
+
+    print(f"               📋 Captured {len(stations)} stations from network")
+    return [{
+        "district": dname,
+        "tehsil": tname,
+        "block": bname,
+        "agency": aname,
+        "mode": mode,
+        "station_code": s["station_code"],
+        "station_name": s["station_name"],
+        "station_id": s["station_id"],
+        "meta_name": s["station_name"]
+    } for s in stations]
+
+
+# -------------------
+# DOM DISCOVERY
+# -------------------
 def fetch_stations_with_metadata(page, iframe, dname, tname, bname, aname, mode):
     """Loop through all stations, reset each time, click, and extract stationId from metadata table."""
     station_data = []
@@ -66,8 +233,11 @@ def fetch_stations_with_metadata(page, iframe, dname, tname, bname, aname, mode)
         station_btn = station_container.locator("div.multiselect-dropdown .dropdown-btn")
 
         station_btn.click(force=True)
-        time.sleep(1.0)
         station_items = station_container.locator("ul.item2 li.multiselect-item-checkbox")
+        try:
+            station_items.first.wait_for(state="attached", timeout=OPTION_TIMEOUT)
+        except Exception:
+            pass   # genuinely empty list
         scount = station_items.count()
         station_btn.click(force=True)
 
@@ -84,14 +254,12 @@ def fetch_stations_with_metadata(page, iframe, dname, tname, bname, aname, mode)
                 station_container = iframe.locator("h3:has-text('Station Selection')").locator("xpath=..")
                 station_btn = station_container.locator("div.multiselect-dropdown .dropdown-btn")
                 station_btn.click(force=True)
-                page.wait_for_timeout(500)
 
                 # 🔄 Reset all previously selected stations (Select all → deselect all)
                 if station_container.locator("li.multiselect-item-checkbox:has-text('Select all')").count() > 0:
                     sel_all = station_container.locator("li.multiselect-item-checkbox:has-text('Select all')")
                     sel_all.click(force=True)   # select all
                     sel_all.click(force=True)   # deselect all
-                    page.wait_for_timeout(500)
 
                 # re-fetch items again after reset
                 station_items = station_container.locator("ul.item2 li.multiselect-item-checkbox")
@@ -141,151 +309,364 @@ def fetch_stations_with_metadata(page, iframe, dname, tname, bname, aname, mode)
         return []
 
 
-def run():
-    stations = []
-    seen_counts = {}
+# -------------------
+# HIERARCHY WALK
+# -------------------
+def dropdown(iframe, label):
+    container = iframe.locator(f"label:has-text('{label}')").locator("xpath=..")
+    return container, container.locator("span.dropdown-btn")
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False, slow_mo=300)
-        page = browser.new_page()
 
-        print("🌐 Opening WRIS...")
-        page.goto("https://indiawris.gov.in/dataSet/")
-        page.wait_for_timeout(4500)
+def station_dropdown(iframe):
+    return iframe.locator("h3:has-text('Station Selection')").locator("xpath=..")
+
+
+def station_count(iframe):
+    """Stations the app currently lists for the selection (0 if it lists none at this level)."""
+    return sum(1 for t in option_texts(station_dropdown(iframe)) if t and "Select all" not in t)
 
-        iframe = None
+
+def reuse_subtree(tree, refresh, path, options, stations, sink, indent):
+    """Refresh mode: replay a node's cached leaves into sink if it is unchanged; else record it.
+
+    Returns True when the subtree was replayed and need not be walked.
+    """
+    if tree is None:
+        return False
+    if refresh and tree.unchanged(path, options, stations):
+        leaves = list(tree.leaves(path))
+        for key, records in leaves:
+            sink(*key[2:], records)
+        METRICS.count("subtrees reused")
+        print(f"{indent}♻️ Unchanged ({stations} stations), {len(leaves)} cached leaves reused")
+        return True
+    tree.put(path, options, stations)
+    return False
+
+
+def list_options(container, btn):
+    btn.click()
+    items = container.locator("li.multiselect-item-checkbox")
+    names = []
+    for i in range(items.count()):
+        txt = items.nth(i).inner_text().strip()
+        if txt and "Select all" not in txt:
+            names.append(txt)
+    btn.click()
+    return names
+
+
+def find_dataset_frame(page, timeout=30000):
+    deadline = time.monotonic() + timeout / 1000
+    while time.monotonic() < deadline:
         for f in page.frames:
             if "/dataSet/" in f.url:
-                iframe = f
-                break
-        if not iframe:
-            print("❌ No iframe found!")
-            return
+                return f
+        page.wait_for_timeout(200)
+    return None
 
-        print("✅ Switched to iframe:", iframe.url)
-
-        iframe.locator("select#applicationSelect").select_option(label=DATASET_NAME)
-        print("✅ Dataset selected:", DATASET_NAME)
-
-        state_container = iframe.locator("label:has-text('State')").locator("xpath=..")
-        state_btn = state_container.locator("span.dropdown-btn")
-        click_option_by_text(state_container, state_btn, STATE_NAME)
-        print("✅ State selected:", STATE_NAME)
-
-        # --- Districts ---
-        dist_container = iframe.locator("label:has-text('District')").locator("xpath=..")
-        dist_btn = dist_container.locator("span.dropdown-btn")
-        dist_btn.click()
-        dist_items = dist_container.locator("li.multiselect-item-checkbox")
-        districts = []
-        for i in range(dist_items.count()):
-            txt = dist_items.nth(i).inner_text().strip()
-            if txt and "Select all" not in txt:
-                districts.append(txt)
-        dist_btn.click()
-        print(f"📍 Found {len(districts)} districts (including duplicates)")
-
-        for dname in districts:
-            occurrence = seen_counts.get(dname, 0)
-            is_duplicate = occurrence > 0
-
-            print(f"\n🏙️ District: {dname} (occurrence #{occurrence + 1})")
-
-            if is_duplicate:
-                print(f"   🔁 Duplicate district detected: {dname} → resetting dependent filters")
-                tehsil_container = iframe.locator("label:has-text('Tehsil')").locator("xpath=..")
-                tehsil_btn = tehsil_container.locator("span.dropdown-btn")
-                reset_dropdown(tehsil_container, tehsil_btn, "Tehsil")
-
-                block_container = iframe.locator("label:has-text('Block')").locator("xpath=..")
-                block_btn = block_container.locator("span.dropdown-btn")
-                reset_dropdown(block_container, block_btn, "Block")
-
-                agency_container = iframe.locator("label:has-text('Agency')").locator("xpath=..")
-                agency_btn = agency_container.locator("span.dropdown-btn")
-                reset_dropdown(agency_container, agency_btn, "Agency")
-
-            click_nth_option_by_text(dist_container, dist_btn, dname, occurrence=occurrence)
-            time.sleep(1.0)
-
-            seen_counts[dname] = occurrence + 1
-
-            # --- Tehsils ---
-            tehsil_container = iframe.locator("label:has-text('Tehsil')").locator("xpath=..")
-            tehsil_btn = tehsil_container.locator("span.dropdown-btn")
-            tehsil_btn.click()
-            tehsil_items = tehsil_container.locator("li.multiselect-item-checkbox")
-            tehsils = []
-            for j in range(tehsil_items.count()):
-                ttxt = tehsil_items.nth(j).inner_text().strip()
-                if ttxt and "Select all" not in ttxt:
-                    tehsils.append(ttxt)
-            tehsil_btn.click()
-            print(f"   📌 Found {len(tehsils)} tehsils for {dname}")
-
-            tehsil_used = False
-
-            for tname in tehsils:
-                print(f"   📌 Trying tehsil: {tname}")
-                click_option_by_text(tehsil_container, tehsil_btn, tname)
-                time.sleep(0.6)
-
-                block_container = iframe.locator("label:has-text('Block')").locator("xpath=..")
-                block_btn = block_container.locator("span.dropdown-btn")
-                block_btn.click()
-                time.sleep(0.9)
-                block_items = block_container.locator("li.multiselect-item-checkbox")
-                blocks = []
-                for b in range(block_items.count()):
-                    btxt = block_items.nth(b).inner_text().strip()
-                    if btxt and "Select all" not in btxt:
-                        blocks.append(btxt)
-                block_btn.click()
-
-                if not blocks:
-                    print(f"      ⚠️ No blocks for tehsil {tname}, trying next tehsil…")
+
+def open_dataset_page(p, state_name, headless):
+    """Launch a browser on the WRIS dataset page with dataset and state selected.
+
+    Returns (browser, page, iframe, capture) or None if the iframe never loads.
+    """
+    browser = p.chromium.launch(headless=headless, slow_mo=0 if headless else 300)
+    page = browser.new_context().new_page()
+    track_requests(page)
+    capture = ResponseCapture(page) if DISCOVERY == "network" else None
+
+    print("🌐 Opening WRIS...")
+    with METRICS.stage("open page"):
+        page.goto("https://indiawris.gov.in/dataSet/")
+        iframe = find_dataset_frame(page)
+    if not iframe:
+        print("❌ No iframe found!")
+        browser.close()
+        return None
+
+    print("✅ Switched to iframe:", iframe.url)
+
+    iframe.wait_for_selector("select#applicationSelect")
+    iframe.locator("select#applicationSelect").select_option(label=DATASET_NAME)
+    print("✅ Dataset selected:", DATASET_NAME)
+
+    state_container, state_btn = dropdown(iframe, "State")
+    dist_container, _ = dropdown(iframe, "District")
+    before = option_texts(dist_container)
+    click_option_by_text(state_container, state_btn, state_name)
+    wait_for_options(page, dist_container, before)
+    print("✅ State selected:", state_name)
+    return browser, page, iframe, capture
+
+
+def district_occurrences(districts):
+    """occurrence[i] = how many earlier entries share districts[i]'s name."""
+    seen, out = {}, []
+    for dname in districts:
+        out.append(seen.get(dname, 0))
+        seen[dname] = out[-1] + 1
+    return out
+
+
+def walk_district(page, iframe, capture, dname, occurrence, is_repeat, sink, done=frozenset(),
+                  tree=None, refresh=False):
+    """Select one district occurrence and walk tehsil -> block -> agency -> mode.
+
+    sink(tehsil, block, agency, mode, records) receives each leaf's stations;
+    leaves whose (dname, occurrence, tehsil, block, agency, mode) key is in
+    `done` are skipped. Every node walked is recorded in `tree`
+    (hierarchyCache); with refresh, nodes whose options and station count
+    match it are not descended and their cached leaves go to sink instead.
+    """
+    print(f"\n🏙️ District: {dname} (occurrence #{occurrence + 1})")
+
+    dist_container, dist_btn = dropdown(iframe, "District")
+    tehsil_container, tehsil_btn = dropdown(iframe, "Tehsil")
+
+    if is_repeat:
+        print(f"   🔁 Duplicate district detected: {dname} → resetting dependent filters")
+        reset_dropdown(tehsil_container, tehsil_btn, "Tehsil")
+
+        block_container, block_btn = dropdown(iframe, "Block")
+        reset_dropdown(block_container, block_btn, "Block")
+
+        agency_container, agency_btn = dropdown(iframe, "Agency")
+        reset_dropdown(agency_container, agency_btn, "Agency")
+
+    before = option_texts(tehsil_container)
+    click_nth_option_by_text(dist_container, dist_btn, dname, occurrence=occurrence)
+    wait_for_options(page, tehsil_container, before)
+
+    # --- Tehsils ---
+    tehsils = list_options(tehsil_container, tehsil_btn)
+    print(f"   📌 Found {len(tehsils)} tehsils for {dname}")
+    district_path = (dname, occurrence)
+    if reuse_subtree(tree, refresh, district_path, tehsils, station_count(iframe), sink, "   "):
+        return True
+
+    for tname in tehsils:
+        print(f"   📌 Trying tehsil: {tname}")
+        block_container, block_btn = dropdown(iframe, "Block")
+        before = option_texts(block_container)
+        click_option_by_text(tehsil_container, tehsil_btn, tname)
+        wait_for_options(page, block_container, before)
+
+        blocks = list_options(block_container, block_btn)
+        if not blocks:
+            print(f"      ⚠️ No blocks for tehsil {tname}, trying next tehsil…")
+            continue
+        tehsil_path = district_path + (tname,)
+        if reuse_subtree(tree, refresh, tehsil_path, blocks, station_count(iframe), sink, "      "):
+            if tree is not None:
+                tree.complete(district_path, [tname])
+            return True
+
+        for bname in blocks:
+            print(f"      🧱 Block: {bname}")
+            agency_container, agency_btn = dropdown(iframe, "Agency")
+            before = option_texts(agency_container)
+            click_option_by_text(block_container, block_btn, bname)
+            wait_for_options(page, agency_container, before)
+
+            agencies = list_options(agency_container, agency_btn)
+            block_path = tehsil_path + (bname,)
+            if reuse_subtree(tree, refresh, block_path, agencies, station_count(iframe), sink, "         "):
+                continue
+
+            for aname in agencies:
+                agency_path = block_path + (aname,)
+                todo = [m for m in MODES if (dname, occurrence, tname, bname, aname, m) not in done]
+                if not todo:
+                    print(f"         ⏭️ Agency already catalogued: {aname}")
+                    if tree is not None:
+                        tree.complete(agency_path, MODES)   # only if its leaves were cached by that run
+                    continue
+                print(f"         🏢 Agency: {aname}")
+                station_container = station_dropdown(iframe)
+                before = option_texts(station_container)
+                click_option_by_text(agency_container, agency_btn, aname)
+                wait_for_options(page, station_container, before)
+                if reuse_subtree(tree, refresh, agency_path, MODES, station_count(iframe), sink, "            "):
                     continue
 
-                tehsil_used = True
-
-                for bname in blocks:
-                    print(f"      🧱 Block: {bname}")
-                    click_option_by_text(block_container, block_btn, bname)
-                    time.sleep(0.5)
-
-                    agency_container = iframe.locator("label:has-text('Agency')").locator("xpath=..")
-                    agency_btn = agency_container.locator("span.dropdown-btn")
-                    agency_btn.click()
-                    time.sleep(0.8)
-                    agency_items = agency_container.locator("li.multiselect-item-checkbox")
-                    agencies = []
-                    for a in range(agency_items.count()):
-                        atxt = agency_items.nth(a).inner_text().strip()
-                        if atxt and "Select all" not in atxt:
-                            agencies.append(atxt)
-                    agency_btn.click()
-
-                    for aname in agencies:
-                        print(f"         🏢 Agency: {aname}")
-                        click_option_by_text(agency_container, agency_btn, aname)
-                        time.sleep(0.4)
-
-                        for mode in MODES:
-                            iframe.locator("select#manualTelemetry").select_option(label=mode)
-                            print(f"            ⚙️ Mode: {mode}")
-                            stations.extend(fetch_stations_with_metadata(page, iframe, dname, tname, bname, aname, mode))
+                for mode in todo:
+                    if capture is not None:
+                        capture.drain()   # drop responses from earlier selections
+                    iframe.locator("select#manualTelemetry").select_option(label=mode)
+                    print(f"            ⚙️ Mode: {mode}")
+                    found = None
+                    if capture is not None:
+                        with METRICS.stage("network discovery"):
+                            found = fetch_stations_from_network(page, capture, dname, tname, bname, aname, mode)
+                    if found is None:
+                        with METRICS.stage("dom discovery"):
+                            found = fetch_stations_with_metadata(page, iframe, dname, tname, bname, aname, mode)
+                    sink(tname, bname, aname, mode, found)
+                    if tree is not None:
+                        tree.put_leaf(agency_path + (mode,), found)
+                if tree is not None:
+                    tree.complete(agency_path, MODES)
+            if tree is not None:
+                tree.complete(block_path, agencies)
+        if tree is not None:
+            tree.complete(tehsil_path, blocks)
+            tree.complete(district_path, [tname])   # the walk stops at the first tehsil with blocks
+        return True
+
+    print(f"⚠️ No valid tehsil found with blocks for district {dname}")
+    return False
+
+
+def scrape_districts(state_name, districts, indices, headless, session=None, writer="main", done=frozenset(),
+                     refresh=False):
+    """Walk the given district indices in one browser, streaming leaves to the catalog parts.
+
+    The nth-occurrence of a duplicate district name is taken from the full
+    list, so shards pick the same entries a single run would. Dependent
+    filters are reset only when this browser has already selected that name.
+    The walked tree goes to <State>_Stations.tree.sqlite; with refresh,
+    unchanged subtrees come from there (see walk_district).
+    Returns the number of stations written; raises if its own browser
+    cannot open the dataset page, so the run is not marked finished.
+    """
+    occurrences = district_occurrences(districts)
+    total = 0
+
+    def scrape(page, iframe, capture, out, tree):
+        local_seen = {}
+        for i in indices:
+            dname, occurrence = districts[i], occurrences[i]
+            if (dname, occurrence) in done:
+                print(f"\n⏭️ District already catalogued: {dname} (occurrence #{occurrence + 1})")
+                continue
 
-                break
+            def sink(tname, bname, aname, mode, found):
+                nonlocal total
+                out.add(i, (dname, occurrence, tname, bname, aname, mode), found)
+                total += len(found)
+                METRICS.count("stations", len(found))
+                METRICS.count("leaves")
+
+            with METRICS.stage("district"):
+                walk_district(page, iframe, capture, dname, occurrence, local_seen.get(dname, 0) > 0, sink, done,
+                              tree, refresh)
+            out.complete_district(i, dname, occurrence)
+            local_seen[dname] = local_seen.get(dname, 0) + 1
+
+    with catalog.CatalogWriter(state_name, writer) as out, HierarchyCache(tree_path(state_name)) as tree:
+        if session is not None:
+            scrape(*session, out, tree)
+            return total
+
+        with sync_playwright() as p:
+            opened = open_dataset_page(p, state_name, headless)
+            if opened is None:
+                # returning would let the run finish a catalogue without this shard's districts
+                raise RuntimeError(f"The WRIS dataset page did not open for {writer}")
+            browser, page, iframe, capture = opened
+            try:
+                scrape(page, iframe, capture, out, tree)
+            finally:
+                browser.close()
+    return total
 
-            if not tehsil_used:
-                print(f"⚠️ No valid tehsil found with blocks for district {dname}")
 
-        with open(OUTFILE, "w", encoding="utf-8") as f:
-            json.dump(stations, f, ensure_ascii=False, indent=2)
+def scrape_shard(*args, **kwargs):
+    """scrape_districts in a shard process; returns that process's metrics for the parent."""
+    scrape_districts(*args, **kwargs)
+    return METRICS.snapshot()
 
-        print(f"\n💾 Saved {len(stations)} stations to {OUTFILE}")
-        browser.close()
+
+def run(state_name=DEFAULT_STATE, shards=SHARDS, headless=None, fresh=False, metrics_path=None, refresh=False):
+    """Catalogue every station of a state into <State>_Stations.json.
+
+    Leaves are streamed to <State>_Stations.parts/ as they finish (see
+    catalog.py); an interrupted run resumes from there unless `fresh`.
+    shards > 1 splits the district list round-robin across that many
+    headless browser processes. refresh re-walks only the parts of the
+    hierarchy whose options or station counts changed since the last run
+    (hierarchyCache.py).
+    """
+    headless = shards > 1 if headless is None else headless
+
+    if fresh or catalog.is_finished(state_name):
+        catalog.reset(state_name)
+    catalog.clear_failure(state_name)
+    done = catalog.done_keys(state_name)
+    if done:
+        print(f"♻️ Resuming: {len(done)} catalogue entries already done")
+
+    try:
+        scrape_all(state_name, shards, headless, done, metrics_path, refresh)
+    except BaseException as e:
+        # getExcels.py --follow stops waiting on this scrape
+        catalog.mark_failed(state_name, repr(e))
+        raise
+
+
+def scrape_all(state_name, shards, headless, done, metrics_path, refresh):
+    with sync_playwright() as p:
+        opened = open_dataset_page(p, state_name, headless)
+        if opened is None:
+            raise RuntimeError(f"The WRIS dataset page did not open for {state_name}")   # run() marks it failed
+        browser, page, iframe, capture = opened
+        try:
+            # --- Districts ---
+            dist_container, dist_btn = dropdown(iframe, "District")
+            districts = list_options(dist_container, dist_btn)
+            print(f"📍 Found {len(districts)} districts (including duplicates)")
+
+            if shards <= 1:
+                scrape_districts(state_name, districts, range(len(districts)), headless,
+                                 session=(page, iframe, capture), done=done, refresh=refresh)
+        finally:
+            browser.close()
+
+    if shards > 1:
+        # spawn: children start their own Playwright driver instead of inheriting ours
+        with ProcessPoolExecutor(max_workers=shards, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(scrape_shard, state_name, districts,
+                                   list(range(k, len(districts), shards)), headless,
+                                   writer=f"shard{k}", done=done, refresh=refresh)
+                       for k in range(shards)]
+            errors = []
+            for k, fut in enumerate(futures):
+                try:
+                    METRICS.merge(fut.result())
+                except Exception as e:
+                    errors.append(e)
+                    # the shard's own traceback rides along as __cause__
+                    print(f"❌ Shard {k + 1}/{shards} failed:\n" + "".join(traceback.format_exception(type(e), e, e.__traceback__)))
+        if errors:
+            print("⚠️ Catalogue incomplete; rerun to resume the failed shards")
+            catalog.compact(state_name)
+            METRICS.report(metrics_path)
+            raise RuntimeError(f"{len(errors)} of {shards} catalogue shards failed") from errors[0]
+
+    with catalog.CatalogWriter(state_name) as out:
+        out.finish()
+    with METRICS.stage("compact"):
+        n = catalog.compact(state_name)
+    print(f"\n💾 Saved {n} stations to {catalog.catalog_path(state_name)}")
+    METRICS.report(metrics_path)
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Catalogue WRIS groundwater stations of a state.")
+    ap.add_argument("--state", help=f"State as shown in the WRIS dropdown (prompted if omitted, default {DEFAULT_STATE})")
+    ap.add_argument("--shards", type=int, default=SHARDS, help="Parallel headless browsers (districts split between them)")
+    ap.add_argument("--headed", action="store_true", help="Show the browser window(s)")
+    ap.add_argument("--fresh", action="store_true", help="Discard an interrupted run's progress instead of resuming")
+    ap.add_argument("--refresh", action="store_true",
+                    help="Only re-walk districts/tehsils/blocks/agencies whose options or station counts changed"
+                         " since the last run; the rest comes from <State>_Stations.tree.sqlite")
+    ap.add_argument("--metrics", help="Also write the run metrics (stage times, stations) to this JSON file")
+    return ap.parse_args()
 
 
 if __name__ == "__main__":
-    run()
+    args = parse_args()
+    state = args.state or input(f"State Name (default: {DEFAULT_STATE}): ").strip() or DEFAULT_STATE
+    run(state, shards=args.shards, headless=False if args.headed else None, fresh=args.fresh,
+        metrics_path=args.metrics, refresh=args.refresh)
@@ -1,13 +1,26 @@
-import json
-import requests
+import argparse
+from contextlib import ExitStack
 import pandas as pd
 from pathlib import Path
-import os
+
+import catalog
+from downloader import BASE_URL, Downloader, FetchError
+from metaCache import MetaCache
+from metrics import METRICS
+from storage import STORES, open_store, station_filename, station_mode
+from syncManifest import RetryQueue, SyncManifest, fingerprint
+from tiers import TIERED_MODES, Tiers, TierStore
 
 # -------------------
 # CONFIG
 # -------------------
 DATASET = "GWATERLVL"   # Dataset code
+WORKERS = 8             # Stations downloaded at the same time
+RATE_LIMIT = 5.0        # Requests per second towards the WRIS host
+MAX_RETRIES = 4         # Retries per request (exponential backoff)
+MAX_ATTEMPTS = 8        # --retry-failed skips stations that failed this many runs
+STORAGE = ["parquet"]   # First backend is the primary store; add "excel" to also export workbooks
+META_TTL = 24 * 3600    # Seconds station metadata is reused from <State>/meta_cache.sqlite (0 = always refetch)
 
 # -------------------
 # COMMON HEADERS
@@ -23,98 +36,244 @@ HEADERS = {
 # HELPER FUNCTIONS
 # -------------------
 def safe(s: str) -> str:
-    """Sanitize text for filenames: spaces -> _, / and \ -> -"""
+    """Sanitize text for filenames: spaces -> _, / and \\ -> -"""
     return str(s).replace("/", "-").replace("\\", "-").replace(" ", "_")
 
+
+def rows_per_day(entry, station_meta):
+    """Reading density from the manifest, to size the first data window."""
+    if not entry or not entry.get("rows") or not entry.get("last_dataTime"):
+        return None
+    first = pd.Timestamp(station_meta.get("data_available_from") or entry["last_dataTime"])
+    days = (pd.Timestamp(entry["last_dataTime"]) - first).days + 1
+    return entry["rows"] / days if days > 0 else None
+
+
+def retire_aliases(st, stores, manifest=None, tier_store=None):
+    """Fold the copies of st stored under its alias paths into its canonical one (catalog.normalize)."""
+    aliases = catalog.alias_records(st)
+    if not aliases:
+        return 0
+    STATION_CODE = st["station_id"]
+    entry = manifest.get(STATION_CODE) if manifest is not None else None
+    latest = entry.get("file") if entry else None
+    retired = sum(store.retire_aliases(st, aliases, latest) for store in stores)
+    if retired:
+        METRICS.count("alias_copies_retired", retired)
+        if tier_store is not None and station_mode(st) in TIERED_MODES:
+            for tiered_st in [st] + aliases:   # the canonical tiers may describe the copy just replaced
+                tier_store.drop(station_mode(st), station_filename(tiered_st))
+    alias_files = {str(stores[0].location(alias)) for alias in aliases}
+    if latest in alias_files and stores[0].exists(st):
+        manifest.update(STATION_CODE, file=str(stores[0].location(st)))
+    return retired
+
+
+def process_station(downloader, st, stores, manifest=None, meta_cache=None, tier_store=None):
+    """Metadata -> data -> save for one station. Runs on a pool thread.
+
+    Metadata comes from meta_cache while it is within its TTL, so an
+    unchanged station is skipped without any request.
+    Readings arrive in time windows (Downloader.fetch_data_chunks) and each
+    window is streamed into the stores before the next is requested. With a
+    manifest, a station whose data_available_Till has not moved is skipped
+    and one already in every store only fetches the missing tail.
+    Telemetry stations also get their daily/monthly/yearly tiers in
+    tier_store, built from the same windows. Copies saved under the
+    station's alias paths by earlier runs are folded into its own first.
+    Returns (status, station_meta, new_rows, save_path), status in full/append/skip.
+    """
+    STATION_CODE = st["station_id"]
+    save_path = stores[0].location(st)
+    mode, station_file = station_mode(st), station_filename(st)
+    tiered = tier_store is not None and mode in TIERED_MODES
+    retire_aliases(st, stores, manifest, tier_store)
+
+    # ---- STEP 1: Metadata ----
+    station_meta = meta_cache.fresh(STATION_CODE) if meta_cache is not None else None
+    if station_meta is None:
+        station_meta = downloader.fetch_meta(STATION_CODE)
+        if meta_cache is not None and meta_cache.put(STATION_CODE, station_meta):
+            METRICS.count("meta_till_changed")
+    meta_fp = fingerprint(station_meta)
+    till = station_meta["data_available_Till"]
+
+    entry = manifest.get(STATION_CODE) if manifest is not None else None
+    density = rows_per_day(entry, station_meta)
+    if (entry and entry.get("file") == str(save_path) and entry.get("last_dataTime")
+            and all(store.exists(st) for store in stores)):
+        if entry.get("data_available_Till") == till and entry.get("fingerprint") == meta_fp:
+            return "skip", station_meta, 0, save_path
+
+        # ---- STEP 2: Tail windows only ----
+        last = pd.Timestamp(entry["last_dataTime"])
+        info_changed = entry.get("fingerprint") != meta_fp
+        new_rows = 0
+        tiers = None
+        if tiered and tier_store.fresh(mode, station_file, [f for store in stores for f in store.raw_files(st)]):
+            tiers = tier_store.load(mode, station_file)
+        for df_new in downloader.fetch_data_chunks(STATION_CODE, last.strftime("%Y-%m-%d"), till,
+                                                   allow_empty=True, rows_per_day=density):
+            if "dataTime" in df_new.columns:
+                df_new = df_new[df_new["dataTime"] > last]
+            if df_new.empty:
+                continue
+            for store in stores:
+                with METRICS.stage(f"write {store.name}"):
+                    store.append(st, station_meta if info_changed else None, df_new)
+            if tiers is not None:
+                with METRICS.stage("tiers"):
+                    tiers.add(df_new)
+            info_changed = False
+            last = df_new["dataTime"].max()
+            new_rows += len(df_new)
+        if info_changed:
+            for store in stores:
+                store.append(st, station_meta, pd.DataFrame())
+        if tiers is not None:
+            tiers.meta = station_meta
+            tier_store.save(mode, station_file, tiers)
+        elif tiered:
+            tier_store.drop(mode, station_file)   # missing or stale; EDA.py rebuilds it from the raw data
+
+        manifest.update(STATION_CODE, data_available_Till=till, fingerprint=meta_fp,
+                        last_dataTime=last.isoformat(), rows=entry.get("rows", 0) + new_rows)
+        return "append", station_meta, new_rows, save_path
+
+    # ---- STEP 2: Data, STEP 3: Save (window by window) ----
+    nrows, last = 0, None
+    tiers = Tiers(station_meta) if tiered else None
+    with ExitStack() as stack:
+        writers = [stack.enter_context(store.writer(st, station_meta)) for store in stores]
+        for df_data in downloader.fetch_data_chunks(STATION_CODE, station_meta["data_available_from"], till,
+                                                    rows_per_day=density):
+            for store, writer in zip(stores, writers):
+                with METRICS.stage(f"write {store.name}"):
+                    writer.write(df_data)
+            if tiers is not None:
+                with METRICS.stage("tiers"):
+                    tiers.add(df_data)
+            nrows += len(df_data)
+            if "dataTime" in df_data.columns:
+                last = df_data["dataTime"].max()
+    if tiers is not None:
+        tier_store.save(mode, station_file, tiers)
+
+    if manifest is not None and last is not None:
+        manifest.update(STATION_CODE, file=str(save_path), data_available_Till=till, fingerprint=meta_fp,
+                        last_dataTime=last.isoformat(), rows=nrows)
+    return "full", station_meta, nrows, save_path
+
 # -------------------
 # MAIN
 # -------------------
-def main():
+def main(state_name=None, workers=WORKERS, rate=RATE_LIMIT, base_url=BASE_URL, full=False, storage=None,
+         follow=False, metrics_path=None, retry_failed=False, limiter=None, meta_ttl=META_TTL):
+    """Download every catalogued station of a state; returns counts per outcome.
+
+    Failed stations go to <State>/retry_queue.jsonl; retry_failed=True runs
+    only the ones whose backoff has passed and that failed fewer than
+    MAX_ATTEMPTS times. `limiter` lets several runs share
+    one RateLimiter (see orchestrate.py).
+    """
     # Ask for state name
-    state_name = input("Enter State Name (e.g., AndhraPradesh): ").strip()
+    state_name = state_name or input("Enter State Name (e.g., AndhraPradesh): ").strip()
     base_folder = Path(state_name)
-    manual_folder = base_folder / "Manual"
-    telemetry_folder = base_folder / "Telemetry"
-
-    # Create folders if not exist
-    manual_folder.mkdir(parents=True, exist_ok=True)
-    telemetry_folder.mkdir(parents=True, exist_ok=True)
-	
-	json_file = f"{safe(STATE_NAME)}_Stations.json"
-    # Load JSON
-    with open(json_file, "r", encoding="utf-8") as f:
-        stations_list = json.load(f)
-
-    for st in stations_list:
-        STATION_CODE = st["station_id"]
-        mode = st.get("mode", "Unknown").capitalize()
-
-        print(f"\n📡 Processing: {STATION_CODE} ({st['station_name']})")
-
-        # ---- STEP 1: Metadata ----
-        meta_url = "https://indiawris.gov.in/stationMaster/getMasterStationsList"
-        meta_payload = {"stationcode": STATION_CODE, "datasetcode": DATASET}
-
-        try:
-            meta_resp = requests.post(meta_url, json=meta_payload, headers=HEADERS, timeout=30)
-            meta_resp.raise_for_status()
-            meta = meta_resp.json()
-        except Exception as e:
-            print(f"❌ Metadata request failed for {STATION_CODE}: {e}")
-            continue
-
-        if meta.get("statusCode") != 200 or not meta.get("data"):
-            print("❌ Metadata fetch failed:", meta)
-            continue
-
-        station_meta = meta["data"][0]
-        print("✅ Station:", station_meta.get("station_Name"))
-        print("📍 District:", station_meta.get("district"))
-        print("📅 Available:", station_meta.get("data_available_from"), "→", station_meta.get("data_available_Till"))
-
-        df_info = pd.DataFrame(list(station_meta.items()), columns=["Field", "Value"])
-
-        # ---- STEP 2: Data ----
-        data_url = "https://indiawris.gov.in/CommonDataSetMasterAPI/getCommonDataSetByStationCode"
-        data_payload = {
-            "station_code": STATION_CODE,
-            "starttime": station_meta["data_available_from"],
-            "endtime": station_meta["data_available_Till"],
-            "dataset": DATASET
-        }
-
-        try:
-            data_resp = requests.post(data_url, json=data_payload, headers=HEADERS, timeout=60)
-            data_resp.raise_for_status()
-            data = data_resp.json()
-        except Exception as e:
-            print(f"❌ Data request failed for {STATION_CODE}: {e}")
-            continue
-
-        if data.get("statusCode") != 200 or not data.get("data"):
-            print("❌ Data fetch failed:", data)
-            continue
-
-        records = data["data"]
-        print(f"✅ Received {len(records)} rows")
-
-        df_data = pd.DataFrame(records)
-        if "dataTime" in df_data.columns:
-            df_data["dataTime"] = pd.to_datetime(df_data["dataTime"])
-
-        # ---- STEP 3: Save ----
-        outfile = f"{safe(st['district'])}_{safe(st['tehsil'])}_{safe(st['block'])}_{safe(st['agency'])}_{safe(st['mode'])}_{safe(st['station_name'])}.xlsx"
-
-        if mode == "Manual":
-            save_path = manual_folder / outfile
-        else:
-            save_path = telemetry_folder / outfile
-
-        with pd.ExcelWriter(save_path, engine="openpyxl") as writer:
-            df_info.to_excel(writer, sheet_name="Info", index=False)
-            df_data.to_excel(writer, sheet_name="Data", index=False)
-
-        print("💾 Saved:", save_path)
+    base_folder.mkdir(parents=True, exist_ok=True)
+    stores = [open_store(name, base_folder, state_name) for name in (storage or STORAGE)]
+    tier_store = TierStore(base_folder)
+
+    retry_queue = RetryQueue(base_folder / "retry_queue.jsonl")
+    if retry_failed:
+        stations_list = retry_queue.pending(max_attempts=MAX_ATTEMPTS)
+        print(f"🔁 Retrying {len(stations_list)} failed stations with {workers} workers")
+        given_up = retry_queue.given_up(MAX_ATTEMPTS)
+        if given_up:
+            print(f"⛔ {len(given_up)} stations failed {MAX_ATTEMPTS} times and are no longer retried"
+                  f" (a normal run still tries them): {', '.join(given_up[:10])}")
+    elif follow:
+        # Download stations while getAllStationsOfAState.py is still appending them
+        stations_list = catalog.follow_stations(state_name)
+        print(f"📡 Following the {state_name} catalogue with {workers} workers")
+    else:
+        with METRICS.stage("load catalog"):
+            stations_list = catalog.load_stations(state_name)
+        print(f"📡 Downloading {len(stations_list)} stations with {workers} workers")
+
+    # Full refresh starts from an empty manifest; the old journal is replaced
+    manifest_path = base_folder / "sync_manifest.jsonl"
+    if full and manifest_path.exists():
+        manifest_path.unlink()
+    manifest = SyncManifest(manifest_path)
+    meta_cache = MetaCache(base_folder / "meta_cache.sqlite", ttl=0 if full else meta_ttl)
+    counts = {"full": 0, "append": 0, "skip": 0, "failed": 0}
+
+    try:
+        with METRICS.stage("download"), manifest, retry_queue, meta_cache, Downloader(
+                base_url=base_url, workers=workers, rate=rate, retries=MAX_RETRIES,
+                headers=HEADERS, dataset=DATASET, limiter=limiter) as downloader:
+            def job(st):
+                return process_station(downloader, st, stores, manifest, meta_cache, tier_store)
+
+            for st, result, err in downloader.map(job, stations_list):
+                STATION_CODE = st["station_id"]
+                if err is not None:
+                    METRICS.count("stations_failed")
+                    counts["failed"] += 1
+                    retry_queue.fail(st, err)
+                    kind = "Request" if isinstance(err, FetchError) else "Processing"
+                    print(f"❌ {kind} failed for {STATION_CODE} ({st['station_name']}): {err}")
+                    continue
+
+                status, station_meta, nrows, save_path = result
+                METRICS.count(f"stations_{status}")
+                METRICS.count("rows", nrows)
+                counts[status] += 1
+                retry_queue.done(STATION_CODE)
+                if status == "skip":
+                    continue
+                print(f"\n✅ Station: {STATION_CODE} ({station_meta.get('station_Name')})")
+                print("📍 District:", station_meta.get("district"))
+                print("📅 Available:", station_meta.get("data_available_from"), "→", station_meta.get("data_available_Till"))
+                if status == "append":
+                    print(f"✅ Received {nrows} new rows")
+                    print("➕ Appended:", save_path)
+                else:
+                    print(f"✅ Received {nrows} rows")
+                    print("💾 Saved:", save_path)
+    finally:
+        with METRICS.stage("close stores"):
+            for store in stores:
+                store.close()
+    print(f"\n⏭️ {counts['skip']} stations already up to date")
+    print(f"🗃️ {meta_cache.hits} stations used cached metadata, {meta_cache.misses} asked WRIS")
+    if counts["failed"]:
+        print(f"🔁 {counts['failed']} stations failed; queued in {retry_queue.path} (rerun with --retry-failed)")
+    METRICS.report(metrics_path)
+    return counts
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Download WRIS groundwater data for every station of a state.")
+    ap.add_argument("--state", help="State folder name (prompted if omitted)")
+    ap.add_argument("--workers", type=int, default=WORKERS, help="Concurrent station downloads")
+    ap.add_argument("--rate", type=float, default=RATE_LIMIT, help="Max requests/second per host (0 = unlimited)")
+    ap.add_argument("--base-url", default=BASE_URL, help="WRIS base URL (point at mockWris.py for local runs)")
+    ap.add_argument("--full", action="store_true", help="Ignore the sync manifest and re-download everything")
+    ap.add_argument("--follow", action="store_true",
+                    help="Start on stations as the scraper catalogues them, until it finishes")
+    ap.add_argument("--storage", nargs="+", choices=sorted(STORES), default=STORAGE,
+                    help="Output backends; the first is the primary store (e.g. --storage parquet excel)")
+    ap.add_argument("--meta-ttl", type=float, default=META_TTL / 3600,
+                    help="Hours to reuse cached station metadata before asking WRIS again (0 = always ask)")
+    ap.add_argument("--retry-failed", action="store_true",
+                    help="Only retry stations from <State>/retry_queue.jsonl whose backoff has passed")
+    ap.add_argument("--metrics", help="Also write the run metrics (stages, HTTP latency, rows) to this JSON file")
+    return ap.parse_args()
+
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    main(args.state, workers=args.workers, rate=args.rate, base_url=args.base_url, full=args.full, storage=args.storage,
+         follow=args.follow, metrics_path=args.metrics, retry_failed=args.retry_failed,
+         meta_ttl=args.meta_ttl * 3600)
@@ -0,0 +1,109 @@
+"""Cached district -> tehsil -> block -> agency -> mode tree of a state's WRIS catalogue.
+
+getAllStationsOfAState.py records every node it walks: the options of the
+next dropdown, the number of stations the app lists for that selection and,
+for every leaf (mode), its station records. Paths are catalogue keys cut at
+the node's depth: (district, occurrence[, tehsil[, block[, agency[, mode]]]]).
+Kept in <State>_Stations.tree.sqlite next to the catalogue.
+
+With --refresh the walk still selects each node it reaches, but compares its
+options and station count with the cache and only descends where they
+differ; the leaves of an unchanged subtree are replayed from here. A node is
+only trusted once its whole subtree has been walked, and a count of 0 proves
+nothing (the app may not list stations above agency level), so such nodes
+are always descended.
+"""
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from storage import safe
+
+
+def tree_path(state_name):
+    return Path(f"{safe(state_name)}_Stations.tree.sqlite")
+
+
+def _key(path):
+    return json.dumps(list(path), ensure_ascii=False)
+
+
+def _prefix(path):
+    """Text every descendant's key starts with."""
+    return _key(path)[:-1] + ", "
+
+
+class HierarchyCache:
+    def __init__(self, path):
+        self.path = str(path)
+        # shards of one scrape write from separate processes; wait for each other's commits
+        self._db = sqlite3.connect(self.path, timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS nodes (
+                path TEXT PRIMARY KEY,
+                options_json TEXT,
+                stations INTEGER NOT NULL,
+                records_json TEXT,
+                complete INTEGER NOT NULL,
+                checked_at REAL NOT NULL
+            )""")
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+
+    def unchanged(self, path, options, stations):
+        """True if the node was fully walked before with these options and this (non-zero) count."""
+        row = self._db.execute("SELECT options_json, stations, complete FROM nodes WHERE path = ?",
+                               (_key(path),)).fetchone()
+        return (row is not None and bool(row[2]) and stations > 0 and row[1] == stations
+                and json.loads(row[0]) == list(options))
+
+    def put(self, path, options, stations):
+        """Record a node about to be walked; cached children no longer among its options are dropped."""
+        depth = len(path)
+        with self._db:
+            gone = [(key,) for (key,) in self._db.execute(
+                        "SELECT path FROM nodes WHERE substr(path, 1, ?) = ?", (len(_prefix(path)), _prefix(path)))
+                    if json.loads(key)[depth] not in options]
+            self._db.executemany("DELETE FROM nodes WHERE path = ?", gone)   # every descendant is listed
+            self._db.execute("INSERT OR REPLACE INTO nodes VALUES (?, ?, ?, NULL, 0, ?)",
+                             (_key(path), json.dumps(list(options), ensure_ascii=False), stations, time.time()))
+
+    def put_leaf(self, path, records):
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO nodes VALUES (?, NULL, ?, ?, 1, ?)",
+                             (_key(path), len(records), json.dumps(records, ensure_ascii=False), time.time()))
+
+    def complete(self, path, children):
+        """Mark a node complete if every child (one per option in `children`) is; returns whether it was.
+
+        A child skipped rather than walked (e.g. already in the catalogue from
+        an earlier run) keeps its parent incomplete unless it is cached complete.
+        """
+        keys = sorted({_key(tuple(path) + (child,)) for child in children})
+        with self._db:
+            walked = self._db.execute(
+                f"SELECT COUNT(*) FROM nodes WHERE complete = 1 AND path IN ({', '.join('?' * len(keys))})",
+                keys).fetchone()[0] if keys else 0
+            if walked < len(keys):
+                return False
+            return self._db.execute("UPDATE nodes SET complete = 1 WHERE path = ?", (_key(path),)).rowcount > 0
+
+    def leaves(self, path):
+        """(leaf path tuple, station records) of every cached leaf under path."""
+        rows = self._db.execute(
+            "SELECT path, records_json FROM nodes WHERE records_json IS NOT NULL AND substr(path, 1, ?) = ?"
+            " ORDER BY rowid", (len(_prefix(path)), _prefix(path)))
+        for key, records in rows.fetchall():
+            yield tuple(json.loads(key)), json.loads(records)
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,91 @@
+"""Parse-once ingestion of station workbooks for EDA.py.
+
+Each workbook is opened a single time and both sheets are read from that
+handle. The parsed Info dict and the cleaned Data frame are pickled under
+<cache_dir>/<sha1(path)>.pkl together with the file's mtime and size, so
+later runs only re-parse workbooks that are new or have changed.
+"""
+import hashlib
+import os
+import pickle
+
+import pandas as pd
+
+CACHE_VERSION = 1   # bump when the parsing/cleaning rules change
+
+
+def parse_info(info_df):
+    info = {}
+    for _, row in info_df.iterrows():
+        if len(row.dropna())>=2:
+            k = str(row.iloc[0]).strip().lower()
+            info[k] = row.iloc[1]
+    return info
+
+
+def parse_workbook(f, clean):
+    """(info, df, messages) for one workbook; df is None when the file can't be used."""
+    messages = []
+    info = {}
+    try:
+        xls = pd.ExcelFile(f)
+    except Exception as e:
+        return info, None, [f"⚠️ Could not open: {f} {e}"]
+
+    with xls:
+        if "Info" in xls.sheet_names:
+            try:
+                info = parse_info(xls.parse("Info", header=None))
+            except Exception as e:
+                messages.append(f"⚠️ Could not parse Info sheet in {f} {e}")
+
+        if "Data" not in xls.sheet_names:
+            messages.append(f"⚠️ Skipping (no Data sheet): {f}")
+            return info, None, messages
+
+        try:
+            df = clean(xls.parse("Data"))
+        except Exception as e:
+            messages.append(f"⚠️ Could not read Data sheet in {f} {e}")
+            return info, None, messages
+
+    return info, df, messages
+
+
+def file_key(f):
+    st = os.stat(f)
+    return (CACHE_VERSION, os.path.abspath(f), st.st_mtime_ns, st.st_size)
+
+
+class IngestCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, f):
+        digest = hashlib.sha1(os.path.abspath(f).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".pkl")
+
+    def load(self, f, clean):
+        """Cached parse_workbook(f, clean)."""
+        key = file_key(f)
+        path = self._path(f)
+        try:
+            with open(path, "rb") as fh:
+                entry = pickle.load(fh)
+            if entry["key"] == key:
+                self.hits += 1
+                return entry["info"], entry["df"], entry["messages"]
+        except (OSError, EOFError, pickle.UnpicklingError, KeyError, AttributeError):
+            pass
+
+        self.misses += 1
+        info, df, messages = parse_workbook(f, clean)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as fh:
+            pickle.dump({"key": key, "info": info, "df": df, "messages": messages},
+                        fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        return info, df, messages
@@ -0,0 +1,82 @@
+"""Station metadata cache for getExcels.py (one SQLite file per state).
+
+getMasterStationsList answers are kept with the time they were fetched.
+Within `ttl` seconds a station's cached metadata is used as is, so an
+unchanged station costs no request at all on a rerun; older entries are
+refetched. Writes are buffered and committed in batches of BATCH rows.
+When a refetch moves data_available_Till, till_changed_at records when
+and put() says so (getExcels counts it as meta_till_changed).
+"""
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_TTL = 24 * 3600
+
+
+class MetaCache:
+    BATCH = 100
+
+    def __init__(self, path, ttl=DEFAULT_TTL):
+        self.path = str(path)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS station_meta (
+                station_id TEXT PRIMARY KEY,
+                meta_json TEXT NOT NULL,
+                till TEXT,
+                fetched_at REAL NOT NULL,
+                till_changed_at REAL
+            )""")
+        self._rows = {row[0]: row for row in self._db.execute(
+            "SELECT station_id, meta_json, till, fetched_at, till_changed_at FROM station_meta")}
+        self._pending = {}
+        self.hits = self.misses = 0
+
+    def fresh(self, station_id):
+        """Cached metadata dict if fetched within the TTL, else None."""
+        row = self._rows.get(station_id)
+        with self._lock:
+            if row is None or time.time() - row[3] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[1])
+
+    def put(self, station_id, meta):
+        """Store freshly fetched metadata; returns True if data_available_Till moved."""
+        now = time.time()
+        till = meta.get("data_available_Till")
+        with self._lock:
+            old = self._rows.get(station_id)
+            changed = old is not None and old[2] != till
+            changed_at = now if changed else (old[4] if old else None)
+            row = (station_id, json.dumps(meta, ensure_ascii=False, default=str), till, now, changed_at)
+            self._rows[station_id] = row
+            self._pending[station_id] = row
+            if len(self._pending) >= self.BATCH:
+                self._flush()
+        return changed
+
+    def _flush(self):
+        if not self._pending:
+            return
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO station_meta VALUES (?, ?, ?, ?, ?)", list(self._pending.values()))
+        self._pending.clear()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
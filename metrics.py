@@ -0,0 +1,161 @@
+"""Run metrics shared by getAllStationsOfAState.py, getExcels.py and EDA.py.
+
+    from metrics import METRICS
+    with METRICS.stage("download"):
+        ...
+    METRICS.observe_http("/stationMaster/getMasterStationsList", seconds, nbytes, status)
+    METRICS.count("rows", len(df))
+    METRICS.report("metrics.json")    # summary table, plus the JSON file if a path is given
+
+Stages accumulate calls, wall time and CPU time (process CPU on the main
+thread, that thread's CPU on pool threads; stages on different threads
+overlap, so their times do not add up to the run). HTTP requests go into
+per-endpoint latency histograms. Peak RSS comes from getrusage where
+available (not on Windows).
+"""
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1e6 if sys.platform == "darwin" else rss / 1e3   # bytes on macOS, KiB elsewhere
+
+
+def _cpu_time():
+    if threading.current_thread() is threading.main_thread():
+        return time.process_time()
+    return time.thread_time()
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.muted = False   # report() stays quiet, e.g. while orchestrate.py runs several scripts
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self._t0 = time.perf_counter()
+            self.stages = {}
+            self.counters = {}
+            self.http = {}
+
+    # ---- recording ----
+    @contextmanager
+    def stage(self, name):
+        wall0, cpu0 = time.perf_counter(), _cpu_time()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - wall0, _cpu_time() - cpu0)
+
+    def add_stage(self, name, wall, cpu=0.0):
+        with self._lock:
+            s = self.stages.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0})
+            s["calls"] += 1
+            s["wall_s"] += wall
+            s["cpu_s"] += cpu
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe_http(self, endpoint, seconds, nbytes=0, status=None):
+        with self._lock:
+            h = self.http.setdefault(endpoint, {"latencies": [], "bytes": 0, "status": {}})
+            h["latencies"].append(seconds)
+            h["bytes"] += nbytes or 0
+            key = str(status) if status is not None else "error"
+            h["status"][key] = h["status"].get(key, 0) + 1
+
+    def merge(self, snap):
+        """Fold in the stages and counters of another process's snapshot()."""
+        with self._lock:
+            for name, other in snap.get("stages", {}).items():
+                s = self.stages.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0})
+                for k in s:
+                    s[k] += other[k]
+            for name, n in snap.get("counters", {}).items():
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    # ---- reporting ----
+    def snapshot(self):
+        """JSON-ready dict of everything recorded so far."""
+        with self._lock:
+            elapsed = time.perf_counter() - self._t0
+            http = {}
+            for endpoint, h in self.http.items():
+                lat = np.array(h["latencies"]) * 1000
+                edges = LATENCY_BUCKETS_MS + [float("inf")]
+                hist = np.histogram(lat, bins=[0] + edges)[0]
+                http[endpoint] = {
+                    "requests": len(lat),
+                    "bytes": h["bytes"],
+                    "status": dict(h["status"]),
+                    "latency_ms": {
+                        "mean": float(lat.mean()) if len(lat) else None,
+                        "p50": float(np.percentile(lat, 50)) if len(lat) else None,
+                        "p95": float(np.percentile(lat, 95)) if len(lat) else None,
+                        "max": float(lat.max()) if len(lat) else None,
+                    },
+                    "histogram_ms": {f"<={e:g}": int(c) for e, c in zip(edges, hist)},
+                }
+            rates = {f"{k}_per_s": v / elapsed for k, v in self.counters.items() if elapsed > 0}
+            return {
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "elapsed_s": elapsed,
+                "peak_rss_mb": peak_rss_mb(),
+                "stages": {k: dict(v) for k, v in self.stages.items()},
+                "counters": dict(self.counters),
+                "rates": rates,
+                "http": http,
+            }
+
+    def summary(self):
+        """End-of-run table as text."""
+        snap = self.snapshot()
+        lines = [f"\n📊 Run metrics ({snap['elapsed_s']:.1f}s"
+                 + (f", peak RSS {snap['peak_rss_mb']:.0f} MB)" if snap["peak_rss_mb"] else ")")]
+        if snap["stages"]:
+            lines.append(f"   {'stage':<28}{'calls':>7}{'wall s':>10}{'cpu s':>10}")
+            for name, s in sorted(snap["stages"].items(), key=lambda kv: -kv[1]["wall_s"]):
+                lines.append(f"   {name:<28}{s['calls']:>7}{s['wall_s']:>10.2f}{s['cpu_s']:>10.2f}")
+        for name, n in sorted(snap["counters"].items()):
+            lines.append(f"   {name:<28}{n:>12,}  ({snap['rates'].get(name + '_per_s', 0):,.1f}/s)")
+        for endpoint, h in snap["http"].items():
+            lat = h["latency_ms"]
+            lines.append(f"   {endpoint}: {h['requests']} requests, {h['bytes'] / 1e6:.1f} MB, "
+                         f"p50 {lat['p50']:.0f} ms, p95 {lat['p95']:.0f} ms, max {lat['max']:.0f} ms, "
+                         f"status {h['status']}")
+        return "\n".join(lines)
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def report(self, path=None):
+        if self.muted:
+            return
+        print(self.summary())
+        if path:
+            self.write(path)
+            print("📝 Metrics written to", path)
+
+
+METRICS = Metrics()
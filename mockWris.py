@@ -0,0 +1,185 @@
+"""Local stand-in for the two WRIS endpoints used by getExcels.py.
+
+    python mockWris.py --catalog Andhrapradesh_Stations.json --port 8765
+    python getExcels.py --state Andhrapradesh --base-url http://127.0.0.1:8765
+
+--latency and --error-rate add a per-request delay and random 503/429
+responses, to exercise the downloader's retries (see benchmarks/pipeline.py).
+"""
+import argparse
+import bisect
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from downloader import DATA_PATH, META_PATH
+
+
+def synthetic_station(station_id, start="2015-01-01", end="2023-12-31", freq="90D", seed=None):
+    """(metadata dict, records list) shaped like the real WRIS responses."""
+    rng = np.random.default_rng(seed if seed is not None else zlib.crc32(station_id.encode()))
+    times = pd.date_range(start, end, freq=freq)
+    values = 10 + np.cumsum(rng.normal(0, 0.5, len(times)))
+    meta = {
+        "station_Code": station_id,
+        "station_Name": f"Station {station_id}",
+        "district": "SYNTHETIC",
+        "latitude": round(float(rng.uniform(13, 19)), 4),
+        "longitude": round(float(rng.uniform(77, 84)), 4),
+        "data_available_from": times[0].strftime("%Y-%m-%d"),
+        "data_available_Till": times[-1].strftime("%Y-%m-%d"),
+    }
+    records = [{
+        "datatypeCode": "HGZ",
+        "datatypeDescription": "MANUAL-Water Level",
+        "dataTime": t.strftime("%Y-%m-%dT%H:%M:%S"),
+        "dataValue": round(float(v), 2),
+        "unitCode": "m"
+    } for t, v in zip(times, values)]
+    return meta, records
+
+
+def synthetic_catalog(n_stations, districts=10, telemetry_share=0.2, seed=0):
+    """Station list shaped like getAllStationsOfAState.py output."""
+    rng = random.Random(seed)
+    stations = []
+    for i in range(n_stations):
+        district = f"District{i % districts:02d}"
+        stations.append({
+            "district": district,
+            "tehsil": f"{district}_Tehsil{rng.randrange(3)}",
+            "block": f"{district}_Block{rng.randrange(5)}",
+            "agency": "CGWB",
+            "mode": "Telemetry" if rng.random() < telemetry_share else "Manual",
+            "station_id": f"SYN{i:06d}",
+            "station_name": f"Synthetic {i}",
+        })
+    return stations
+
+
+class MockWris:
+    """Threaded HTTP server serving `stations` = {station_id: (meta, records)}.
+
+    latency: seconds added to every request (plus up to 50% jitter);
+    error_rate: share of requests answered with a retryable 503 or 429.
+    """
+
+    def __init__(self, stations, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, seed=0):
+        self.stations = stations
+        self.latency = latency
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._index = {}
+        self.requests = []
+        handler = self._make_handler()
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _make_handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive, like the real host
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                mock.requests.append((self.path, payload))
+                status, body = mock.inject() or mock.respond(self.path, payload)
+                raw = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        return Handler
+
+    def inject(self):
+        """Sleep for the configured latency; maybe return an injected error response."""
+        with self._rng_lock:
+            jitter, roll, code = self._rng.random(), self._rng.random(), self._rng.choice((503, 429))
+        if self.latency:
+            time.sleep(self.latency * (1 + 0.5 * jitter))
+        if roll < self.error_rate:
+            return code, {"statusCode": code, "message": "Injected error"}
+        return None
+
+    def _day_keys(self, station_id, records):
+        # Records are time-sorted, so date windows are two bisects on the date prefix
+        keys = self._index.get(station_id)
+        if keys is None or len(keys) != len(records):
+            keys = self._index[station_id] = [r["dataTime"][:10] for r in records]
+        return keys
+
+    def respond(self, path, payload):
+        if path == META_PATH:
+            entry = self.stations.get(payload.get("stationcode"))
+            if entry is None:
+                return 200, {"statusCode": 404, "data": []}
+            return 200, {"statusCode": 200, "data": [entry[0]]}
+        if path == DATA_PATH:
+            entry = self.stations.get(payload.get("station_code"))
+            if entry is None:
+                return 200, {"statusCode": 404, "data": []}
+            keys = self._day_keys(payload.get("station_code"), entry[1])
+            start = pd.Timestamp(payload["starttime"]).strftime("%Y-%m-%d")
+            end = pd.Timestamp(payload["endtime"]).strftime("%Y-%m-%d")
+            rows = entry[1][bisect.bisect_left(keys, start):bisect.bisect_right(keys, end)]
+            return 200, {"statusCode": 200, "data": rows}
+        return 404, {"statusCode": 404, "message": "Not found"}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve synthetic WRIS responses for a station catalog.")
+    ap.add_argument("--catalog", required=True, help="<State>_Stations.json to mirror")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503/429")
+    args = ap.parse_args()
+
+    with open(args.catalog, "r", encoding="utf-8") as f:
+        catalog = json.load(f)
+    stations = {st["station_id"]: synthetic_station(st["station_id"]) for st in catalog if st.get("station_id")}
+
+    mock = MockWris(stations, port=args.port, latency=args.latency, error_rate=args.error_rate)
+    print(f"🧪 Mock WRIS serving {len(stations)} stations on {mock.base_url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Refresh several states without prompts: scrape -> download -> EDA.
+
+    python orchestrate.py --states "Andhra Pradesh" Telangana Karnataka
+    python orchestrate.py --states Telangana --stages download eda --rate 5 --workers 8
+
+Each stage runs on its own thread and takes states from the previous
+stage's queue, so one state is analysed while the next downloads and a
+third is scraped. All downloads share one token bucket towards WRIS.
+Stations that fail go to <State>/retry_queue.jsonl; once every state has
+had its first pass they are retried in rounds (each waits out the queued
+backoff), and a state whose retries recovered stations is analysed again.
+"""
+import argparse
+import queue
+import threading
+import time
+from pathlib import Path
+
+import matplotlib
+matplotlib.use("Agg")   # EDA plots from a worker thread
+
+import getExcels  # noqa: E402
+from downloader import BASE_URL, RateLimiter  # noqa: E402
+from metrics import METRICS  # noqa: E402
+from syncManifest import RetryQueue  # noqa: E402
+
+STAGES = ["scrape", "download", "eda"]
+RETRY_ROUNDS = 3
+_DONE = None
+
+
+class Pipeline:
+    def __init__(self, states, stages=STAGES, rate=getExcels.RATE_LIMIT, workers=getExcels.WORKERS,
+                 shards=1, eda_workers=1, base_url=BASE_URL, storage=None, retry_rounds=RETRY_ROUNDS,
+                 refresh_catalog=False):
+        self.states = list(states)
+        self.stages = [s for s in STAGES if s in stages]
+        self.limiter = RateLimiter(rate)   # shared by every download, whichever state
+        self.workers = workers
+        self.shards = shards
+        self.eda_workers = eda_workers
+        self.base_url = base_url
+        self.storage = storage
+        self.retry_rounds = retry_rounds
+        self.refresh_catalog = refresh_catalog
+        self.status = {state: {} for state in self.states}
+        self._lock = threading.Lock()
+
+    def _record(self, state, stage, outcome, seconds):
+        with self._lock:
+            self.status[state][stage] = (outcome, seconds)
+        print(f"🧭 {state}: {stage} {outcome} in {seconds:.1f}s")
+
+    def _run_stage(self, stage, state, fn):
+        """fn(state) timed and logged; returns (ok, result)."""
+        t0 = time.perf_counter()
+        try:
+            with METRICS.stage(stage):
+                result = fn(state)
+        except BaseException as e:   # SystemExit from a script counts as a failure too
+            self._record(state, stage, f"failed: {e!r}", time.perf_counter() - t0)
+            return False, None
+        outcome = ", ".join(f"{k} {v}" for k, v in result.items() if v) if isinstance(result, dict) else "ok"
+        self._record(state, stage, outcome or "ok", time.perf_counter() - t0)
+        return True, result
+
+    # ---- stages ----
+    def scrape(self, state):
+        import getAllStationsOfAState   # needs playwright; only imported when scraping
+        getAllStationsOfAState.run(state, shards=self.shards, headless=True, refresh=self.refresh_catalog)
+
+    def download(self, state, retry_failed=False):
+        return getExcels.main(state, workers=self.workers, base_url=self.base_url, storage=self.storage,
+                              retry_failed=retry_failed, limiter=self.limiter)
+
+    def eda(self, state):
+        import EDA
+        EDA.main(state, workers=self.eda_workers)
+
+    # ---- scheduling ----
+    def _worker(self, stage, inbox, outbox):
+        fn = getattr(self, stage)
+        while True:
+            state = inbox.get()
+            if state is _DONE:
+                if stage == "download":
+                    self._retry(outbox)
+                if outbox is not None:
+                    outbox.put(_DONE)
+                return
+            ok, _ = self._run_stage(stage, state, fn)
+            if ok and outbox is not None:
+                outbox.put(state)
+
+    def _retry(self, outbox):
+        """Retry every queued station of every state once per round, after its backoff."""
+        for _ in range(self.retry_rounds):
+            due = {}
+            for state in self.states:
+                path = Path(state) / "retry_queue.jsonl"
+                if path.exists():
+                    with RetryQueue(path) as q:
+                        due_at = q.all_due_at(getExcels.MAX_ATTEMPTS)
+                        if due_at is not None:
+                            due[state] = due_at
+            if not due:
+                return
+            wait = max(due.values()) - time.time()
+            if wait > 0:
+                print(f"🔁 Waiting {wait:.0f}s before retrying failed stations")
+                time.sleep(wait)
+            for state in due:
+                ok, counts = self._run_stage("retry", state, lambda s: self.download(s, retry_failed=True))
+                if ok and counts["full"] + counts["append"] + counts["skip"] > 0 and outbox is not None:
+                    outbox.put(state)   # analyse again with the recovered stations
+
+    def run(self):
+        METRICS.muted = True
+        inboxes = [queue.Queue() for _ in self.stages]
+        threads = []
+        for i, stage in enumerate(self.stages):
+            outbox = inboxes[i + 1] if i + 1 < len(self.stages) else None
+            t = threading.Thread(target=self._worker, args=(stage, inboxes[i], outbox), name=stage, daemon=True)
+            t.start()
+            threads.append(t)
+        for state in self.states:
+            inboxes[0].put(state)
+        inboxes[0].put(_DONE)
+        for t in threads:
+            t.join()
+        METRICS.muted = False
+        return self.status
+
+    def summary(self):
+        cols = self.stages + (["retry"] if "download" in self.stages else [])
+        lines = [f"\n{'state':<24}" + "".join(f"{c:>24}" for c in cols)]
+        for state, done in self.status.items():
+            cells = []
+            for c in cols:
+                outcome, seconds = done.get(c, ("-", None))
+                cell = outcome[:16] + (f" {seconds:.0f}s" if seconds is not None else "")
+                cells.append(f"{cell:>24}")
+            lines.append(f"{state:<24}" + "".join(cells))
+        return "\n".join(lines)
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Scrape, download and analyse several states as one pipeline.")
+    ap.add_argument("--states", nargs="+", required=True, help="States as shown in the WRIS dropdown")
+    ap.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    ap.add_argument("--rate", type=float, default=getExcels.RATE_LIMIT,
+                    help="Requests/second to WRIS across all downloads together")
+    ap.add_argument("--workers", type=int, default=getExcels.WORKERS, help="Concurrent station downloads")
+    ap.add_argument("--shards", type=int, default=1, help="Headless browsers per state scrape")
+    ap.add_argument("--refresh-catalog", action="store_true",
+                    help="Scrape only the changed parts of each state's hierarchy (getAllStationsOfAState.py --refresh)")
+    ap.add_argument("--eda-workers", type=int, default=1, help="EDA processes per state")
+    ap.add_argument("--retry-rounds", type=int, default=RETRY_ROUNDS,
+                    help="Passes over the retry queues after the first download of every state")
+    ap.add_argument("--base-url", default=BASE_URL, help="WRIS base URL (point at mockWris.py for local runs)")
+    ap.add_argument("--storage", nargs="+", default=None, help="Download backends (see getExcels.py --storage)")
+    ap.add_argument("--metrics", help="Write the combined run metrics to this JSON file")
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    pipeline = Pipeline(args.states, args.stages, rate=args.rate, workers=args.workers, shards=args.shards,
+                        eda_workers=args.eda_workers, base_url=args.base_url, storage=args.storage,
+                        retry_rounds=args.retry_rounds, refresh_catalog=args.refresh_catalog)
+    pipeline.run()
+    print(pipeline.summary())
+    METRICS.report(args.metrics)
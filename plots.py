@@ -0,0 +1,206 @@
+"""Per-station hydrographs and per-district panels for EDA.py.
+
+    <output_dir>/hydrographs/stations/<station_file stem>.png
+    <output_dir>/hydrographs/districts/<district>.png
+
+Figures are drawn on Agg canvases through matplotlib's object API (no
+pyplot state, nothing left open) on EDA.py's process pool. A plot is only
+redrawn when its fingerprint changed: the station's input fingerprint
+(EDA.input_fingerprint) for a hydrograph, the fingerprints of all of its
+stations for a district panel. They are kept in
+<output_dir>/hydrographs/fingerprints.json.
+"""
+import hashlib
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import seasonal
+from storage import safe
+
+PLOTS_VERSION = 3   # bump when the drawing changes, to redraw everything
+DPI = 100
+MAX_DISTRICT_LINES = 40   # individual station lines drawn behind the district median
+
+
+def monthly_series(df):
+    """Monthly mean levels, as EDA.station_summary computes them."""
+    return df.set_index("dataTime")["dataValue"].resample("M").mean()
+
+
+def anomaly_months(monthly):
+    """Boolean Series: months whose seasonal robust z (seasonal.py) is beyond ANOMALY_Z."""
+    return seasonal.series_scores(monthly).abs() > seasonal.ANOMALY_Z
+
+
+def _figure(**kw):
+    fig = Figure(**kw)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def draw_station(path, monthly, title, slope=np.nan, intercept=np.nan):
+    """slope (m/year) and intercept (m) are the summary's OLS fit over the non-empty months, indexed 0, 1, ..."""
+    fig = _figure(figsize=(8, 3.5))
+    ax = fig.add_subplot()
+    valid = monthly.dropna()
+    ax.plot(valid.index, valid.values, color="tab:blue", lw=1, marker=".", ms=3, label="Monthly mean")
+    if np.isfinite(slope) and np.isfinite(intercept):
+        ax.plot(valid.index, intercept + slope / 12 * np.arange(len(valid)), color="tab:red", lw=1.2,
+                label=f"Linear trend ({slope:+.2f} m/year)")
+    flagged = anomaly_months(monthly)
+    if flagged.any():
+        ax.scatter(monthly.index[flagged], monthly[flagged], color="tab:orange", s=25, zorder=3,
+                   label=f"Seasonal anomaly (|robust z| > {seasonal.ANOMALY_Z:g})")
+    ax.set_title(title, fontsize=9)
+    ax.set_ylabel("Water level (m)")
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=7, loc="upper left")
+    fig.subplots_adjust(left=0.08, right=0.98, bottom=0.1, top=0.9)   # fixed margins: tight_layout costs a full extra draw
+    fig.savefig(path, dpi=DPI)
+
+
+def draw_district(path, district, members):
+    """Median and inter-quartile band of the stations' monthly means, with station counts below."""
+    frame = pd.concat(members, axis=1).sort_index()
+    flagged = pd.concat([anomaly_months(m).reindex(frame.index, fill_value=False) for m in members], axis=1)
+    fig = _figure(figsize=(9, 5))
+    top, bottom = fig.subplots(2, 1, sharex=True, gridspec_kw={"height_ratios": [3, 1]})
+    if frame.shape[1] <= MAX_DISTRICT_LINES:
+        for col in frame.columns:
+            line = frame[col].dropna()
+            top.plot(line.index, line.values, color="0.75", lw=0.6)
+    reported = frame[frame.notna().any(axis=1)]   # manual stations report quarterly; bridge the empty months
+    top.fill_between(reported.index, reported.quantile(0.25, axis=1), reported.quantile(0.75, axis=1),
+                     color="tab:blue", alpha=0.25, lw=0, label="25-75% of stations")
+    top.plot(reported.index, reported.median(axis=1), color="tab:blue", lw=1.2, label="Median")
+    top.set_ylabel("Water level (m)")
+    top.set_title(f"{district}: {frame.shape[1]} stations", fontsize=10)
+    top.grid(True, alpha=0.3)
+    top.legend(fontsize=7)
+    width = 25   # days, one bar per month
+    bottom.bar(frame.index, frame.notna().sum(axis=1), width=width, color="0.6", label="Reporting")
+    bottom.bar(frame.index, flagged.sum(axis=1), width=width, color="tab:orange", label="Anomalous")
+    bottom.set_ylabel("Stations")
+    bottom.legend(fontsize=7)
+    fig.subplots_adjust(left=0.08, right=0.98, bottom=0.06, top=0.94, hspace=0.08)
+    fig.savefig(path, dpi=DPI)
+
+
+# ---- pool workers (top level so they pickle) ----
+def render_station(task):
+    """Load one station; draw its hydrograph if asked, return its monthly series if asked."""
+    import EDA
+    item, png, title, trend, want_monthly = task
+    try:
+        station_file, source, info, df, messages = EDA.load_input(item)
+        if df is None:
+            return None, messages
+        monthly = monthly_series(df)
+        if png:
+            draw_station(png, monthly, title, *trend)
+        return (monthly if want_monthly else None), []
+    except Exception as e:
+        return None, [f"⚠️ Could not plot {item[1]}: {e!r}"]
+
+
+def render_district(task):
+    png, district, members = task
+    try:
+        draw_district(png, district, members)
+        return []
+    except Exception as e:
+        return [f"⚠️ Could not plot district {district}: {e!r}"]
+
+
+def _digest(*parts):
+    h = hashlib.sha1(f"plots-v{PLOTS_VERSION}".encode("ascii"))
+    for p in parts:
+        h.update(b"\0" + str(p).encode("utf-8"))
+    return h.hexdigest()
+
+
+def render(items, summary_df, output_dir, workers=1, fingerprints=None):
+    """Draw the hydrographs and district panels whose inputs changed; returns counts.
+
+    fingerprints ({input_key: fingerprint}, as returned by EDA.run_incremental)
+    saves hashing the inputs again; items missing from it are hashed here.
+    """
+    import EDA
+    root = Path(output_dir) / "hydrographs"
+    station_dir, district_dir = root / "stations", root / "districts"
+    station_dir.mkdir(parents=True, exist_ok=True)
+    district_dir.mkdir(parents=True, exist_ok=True)
+    state_path = root / "fingerprints.json"
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            old = json.load(f)
+    except (OSError, ValueError):
+        old = {}
+    new = {}
+
+    rows = {f"{r['source']}/{r['station_file']}": r for r in summary_df.to_dict("records")} \
+        if not summary_df.empty else {}
+    stations, members = [], defaultdict(list)
+    for item in items:
+        key = EDA.input_key(item)
+        row = rows.get(key)
+        if row is None:
+            continue   # unusable input, nothing to draw
+        fp = (fingerprints or {}).get(key) or EDA.input_fingerprint(item)
+        fp = _digest(fp)
+        png = station_dir / (Path(row["station_file"]).stem + ".png")
+        stations.append((item, row, fp, png))
+        members[str(row["district"])].append(fp)
+
+    districts = {}
+    for district, fps in members.items():
+        png = district_dir / f"{safe(district)}.png"
+        districts[district] = (_digest(*sorted(fps)), png)
+    stale_districts = {d for d, (fp, png) in districts.items()
+                       if old.get(str(png.relative_to(root))) != fp or not png.exists()}
+
+    tasks, owners = [], []
+    for item, row, fp, png in stations:
+        rel = str(png.relative_to(root))
+        draw = old.get(rel) != fp or not png.exists()
+        want = str(row["district"]) in stale_districts
+        new[rel] = fp
+        if draw or want:
+            title = (f"{row['station_name'] or Path(row['station_file']).stem} ({row['district']}, {row['source']})"
+                     f" - slope {row['trend_slope_m_per_year']:+.2f} m/year, MK p={row['mk_pval']:.3f}")
+            trend = (row["trend_slope_m_per_year"], row.get("trend_intercept_m", np.nan))
+            tasks.append((item, str(png) if draw else None, title, trend, want))
+            owners.append(str(row["district"]))
+
+    counts = {"stations drawn": sum(1 for t in tasks if t[1]), "districts drawn": 0}
+    counts["stations unchanged"] = len(stations) - counts["stations drawn"]
+    series = defaultdict(list)
+    for district, (monthly, messages) in zip(owners, EDA.pool_map(render_station, tasks, workers)):
+        for msg in messages:
+            print(msg)
+        if monthly is not None and not monthly.dropna().empty:
+            series[district].append(monthly)
+
+    dtasks = [(str(districts[d][1]), d, series[d]) for d in sorted(stale_districts) if series[d]]
+    for messages in EDA.pool_map(render_district, dtasks, workers):
+        for msg in messages:
+            print(msg)
+    counts["districts drawn"] = len(dtasks)
+    for district, (fp, png) in districts.items():
+        new[str(png.relative_to(root))] = fp
+
+    # plots of stations / districts that are gone
+    for rel in set(old) - set(new):
+        (root / rel).unlink(missing_ok=True)
+    tmp = state_path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(new, f, indent=0)
+    os.replace(tmp, state_path)
+    return counts
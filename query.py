@@ -0,0 +1,572 @@
+"""Indexed query layer over a downloaded state (SQLite, no server needed).
+
+    python query.py index --base-dir AndhraPradesh [--catalog Andhrapradesh_Stations.json]
+    python query.py stations --district Anantapur --mode Telemetry
+    python query.py readings --station CGWHYD0414 --start 2024-01-01 --end 2024-03-31
+    python query.py series --district Anantapur --freq yearly --by district
+    python query.py serve --port 8080     # GET /stations, /readings, /series with the same filters
+
+    from query import GroundwaterDB
+    with GroundwaterDB("AndhraPradesh/query.sqlite") as db:
+        db.series(district="Anantapur", freq="monthly", by="block")
+
+`index` reads the Parquet dataset (or the workbooks, through EDA.py's ingest
+cache) into <base-dir>/query.sqlite: one row per station, every reading,
+and daily/monthly/yearly count/sum/min/max per station (tiers.py). Reruns
+only reindex stations whose raw files changed. Filters match
+state/district/block/mode case-insensitively; `station` matches the
+station id or file name. A station the catalog also lists under other
+paths (catalog.normalize aliases) is stored once and matches district/block
+filters and file names of any of its paths; grouped series count it under
+its own path. Grouped series average the station means of each
+period, so dense Telemetry stations do not outweigh Manual ones.
+"""
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from storage import station_filename
+from tiers import TIERS, aggregate, compact
+
+FREQS = list(TIERS)   # daily, monthly, yearly
+LEVELS = {"state": ["state"], "district": ["district"], "block": ["district", "block"], "mode": ["mode"]}
+GROUPS = ["station"] + list(LEVELS)
+FILTERS = ["state", "district", "block", "mode", "station"]
+PATH_FILTERS = ["district", "block"]   # also matched against the aliases table
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stations (
+    id INTEGER PRIMARY KEY,
+    station_file TEXT NOT NULL UNIQUE,
+    station_id TEXT COLLATE NOCASE,
+    state TEXT COLLATE NOCASE,
+    district TEXT COLLATE NOCASE,
+    tehsil TEXT COLLATE NOCASE,
+    block TEXT COLLATE NOCASE,
+    agency TEXT,
+    mode TEXT COLLATE NOCASE,
+    station_name TEXT,
+    lat REAL,
+    lon REAL,
+    first_time INTEGER,
+    last_time INTEGER,
+    readings INTEGER,
+    source_mtime INTEGER
+);
+CREATE INDEX IF NOT EXISTS stations_area ON stations (state, district, block);
+CREATE INDEX IF NOT EXISTS stations_district ON stations (district, block);
+CREATE INDEX IF NOT EXISTS stations_mode ON stations (mode);
+CREATE INDEX IF NOT EXISTS stations_station_id ON stations (station_id);
+CREATE TABLE IF NOT EXISTS aliases (
+    station_file TEXT PRIMARY KEY,
+    station_id TEXT NOT NULL COLLATE NOCASE,
+    district TEXT COLLATE NOCASE,
+    tehsil TEXT COLLATE NOCASE,
+    block TEXT COLLATE NOCASE,
+    agency TEXT
+);
+CREATE INDEX IF NOT EXISTS aliases_district ON aliases (district, block);
+CREATE INDEX IF NOT EXISTS aliases_station_id ON aliases (station_id);
+CREATE TABLE IF NOT EXISTS readings (
+    station INTEGER NOT NULL,
+    t INTEGER NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS readings_station_time ON readings (station, t, value);
+CREATE TABLE IF NOT EXISTS agg (
+    station INTEGER NOT NULL,
+    freq TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    total REAL NOT NULL,
+    lo REAL NOT NULL,
+    hi REAL NOT NULL,
+    PRIMARY KEY (station, freq, start)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup (
+    level TEXT NOT NULL,
+    freq TEXT NOT NULL,
+    k1 TEXT NOT NULL COLLATE NOCASE,
+    k2 TEXT NOT NULL COLLATE NOCASE,
+    start INTEGER NOT NULL,
+    mean REAL,
+    lo REAL,
+    hi REAL,
+    stations INTEGER,
+    n INTEGER,
+    PRIMARY KEY (level, freq, k1, k2, start)
+) WITHOUT ROWID;
+"""
+
+
+def epoch(ts):
+    return None if ts is None else int(pd.Timestamp(ts).value // 10**9)
+
+
+def end_before(end):
+    """Exclusive upper bound (epoch seconds) of an inclusive `end`; a date-only end covers that whole day."""
+    ts = pd.Timestamp(end)
+    if isinstance(end, str) and not any(c in end for c in ":T "):
+        return epoch(ts + pd.Timedelta(days=1))
+    return epoch(ts) + 1
+
+
+def period_start(ts, freq):
+    """Start (epoch seconds) of the daily/monthly/yearly period containing ts."""
+    unit = TIERS[freq]
+    return int(np.datetime64(pd.Timestamp(ts).to_datetime64(), unit).astype("datetime64[s]").astype(np.int64))
+
+
+def to_time(seconds):
+    return pd.to_datetime(np.asarray(seconds, dtype=np.int64), unit="s")
+
+
+# -------------------
+# SOURCES
+# -------------------
+def _catalog(path):
+    """Normalized catalog records (one per station_id, with aliases), [] without a catalog."""
+    import catalog
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [st for st in catalog.normalize(json.load(f)) if st.get("station_id")]
+
+
+def _catalog_by_file(path):
+    """Catalog record per file name, alias file names included (files saved before normalization)."""
+    import catalog
+    by_file = {}
+    for st in _catalog(path):
+        for named in [st] + catalog.alias_records(st):
+            by_file.setdefault(station_filename(named), st)
+    return by_file
+
+
+def _fields(station_file, mode, info, st=None):
+    """stations row (without times) from the lower-cased Info/meta dict and the catalog entry."""
+    st = st or {}
+
+    def pick(*values):
+        for v in values:
+            if v is not None and not (isinstance(v, float) and np.isnan(v)) and str(v).strip() not in ("", "-"):
+                return str(v).strip()
+        return None
+
+    return {
+        "station_file": station_file,
+        "station_id": pick(st.get("station_id"), info.get("station_code")),
+        "state": pick(info.get("state")),
+        "district": pick(st.get("district"), info.get("district")),
+        "tehsil": pick(st.get("tehsil"), info.get("tehsil")),
+        "block": pick(st.get("block"), info.get("block")),
+        "agency": pick(st.get("agency"), info.get("agency_name")),
+        "mode": mode,
+        "station_name": pick(st.get("station_name"), info.get("station_name")),
+        "lat": pd.to_numeric(info.get("latitude"), errors="coerce"),
+        "lon": pd.to_numeric(info.get("longitude"), errors="coerce"),
+    }
+
+
+def excel_sources(base_dir, catalog_path=None):
+    """(station_file, mode, source_mtime, load) per workbook; load() -> (fields, df)."""
+    by_file = _catalog_by_file(catalog_path)
+    cache_dir = os.path.join(base_dir, ".cache", "ingest")
+    for mode in ("Manual", "Telemetry"):
+        for f in sorted(glob.glob(os.path.join(base_dir, mode, "*.xls*"))):
+            name = os.path.basename(f)
+
+            def load(f=f, name=name, mode=mode):
+                from EDA import clean_df   # same parsing rules and cache as EDA.py
+                from ingestCache import IngestCache
+                info, df, _ = IngestCache(cache_dir).load(f, clean_df)
+                return _fields(name, mode, info, by_file.get(name)), df
+
+            yield name, mode, os.stat(f).st_mtime_ns, load
+
+
+def parquet_sources(base_dir, catalog_path=None, stale=None):
+    """Like excel_sources for <base-dir>/dataset; the readings of every stale station come from one scan."""
+    import pyarrow.dataset as ds
+    from storage import ParquetStore
+    store = ParquetStore(base_dir)
+    rows = store.read_stations().to_dict("records")
+    mtimes = [max((p.stat().st_mtime_ns for p in store.parts(row)), default=0) for row in rows]
+    wanted = [row["station_id"] for row, mtime in zip(rows, mtimes)
+              if stale is None or stale(row["station_file"], mtime)]
+    groups = {}
+    if wanted:
+        data = store.read_data(columns=["station_id", "dataTime", "dataValue"],
+                               filter=ds.field("station_id").isin(wanted))
+        groups = dict(list(data.groupby("station_id", observed=True, sort=False)))
+
+    for row, mtime in zip(rows, mtimes):
+        def load(row=row):
+            meta = json.loads(row["meta_json"])
+            info = {str(k).strip().lower(): v for k, v in meta.items() if v is not None}
+            return _fields(row["station_file"], str(row["mode"]), info, row), groups.get(row["station_id"])
+
+        yield row["station_file"], str(row["mode"]), mtime, load
+
+
+# -------------------
+# DATABASE
+# -------------------
+class GroundwaterDB:
+    def __init__(self, path):
+        self.path = str(path)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- indexing ----
+    def refresh(self, base_dir, storage=None, catalog_path=None):
+        """Reindex the stations whose raw files changed; returns counts."""
+        storage = storage or ("parquet" if os.path.exists(os.path.join(base_dir, "dataset", "stations.parquet"))
+                              else "excel")
+        if catalog_path is None:
+            import catalog
+            catalog_path = catalog.catalog_path(os.path.basename(os.path.normpath(base_dir)))
+        known = dict(self._db.execute("SELECT station_file, source_mtime FROM stations"))
+
+        def stale(station_file, mtime):
+            return known.get(station_file) != mtime
+
+        if storage == "parquet":
+            sources = parquet_sources(base_dir, catalog_path, stale)
+        else:
+            sources = excel_sources(base_dir, catalog_path)
+        self._index_aliases(catalog_path)
+        counts = {"indexed": 0, "unchanged": 0, "removed": 0}
+        seen = set()
+        for station_file, mode, mtime, load in sources:
+            seen.add(station_file)
+            if not stale(station_file, mtime):
+                counts["unchanged"] += 1
+                continue
+            fields, df = load()
+            with self._db:
+                self._index_station(fields, df, mtime)
+            counts["indexed"] += 1
+        for station_file in set(known) - seen:
+            with self._db:
+                self._drop(station_file)
+            counts["removed"] += 1
+        if counts["indexed"] or counts["removed"] or not self._db.execute("SELECT 1 FROM rollup").fetchone():
+            with self._db:
+                self._rollup()
+        self._db.execute("ANALYZE")
+        return counts
+
+    def _index_aliases(self, catalog_path):
+        import catalog
+        rows = [(station_filename(alias), st["station_id"], alias.get("district"), alias.get("tehsil"),
+                 alias.get("block"), alias.get("agency"))
+                for st in _catalog(catalog_path) for alias in catalog.alias_records(st)]
+        with self._db:
+            self._db.execute("DELETE FROM aliases")
+            self._db.executemany("INSERT OR REPLACE INTO aliases VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def _rollup(self):
+        """Precompute the unfiltered grouped series of every level and freq."""
+        self._db.execute("DELETE FROM rollup")
+        for level, keys in LEVELS.items():
+            k1, k2 = [f"COALESCE(s.{k}, '') COLLATE NOCASE" for k in keys] + ["''"] * (2 - len(keys))
+            for freq in TIERS:
+                self._db.execute(
+                    f"INSERT INTO rollup SELECT ?, ?, {k1}, {k2}, a.start, AVG(a.total / a.n), MIN(a.lo), MAX(a.hi),"
+                    " COUNT(*), SUM(a.n) FROM stations s JOIN agg a ON a.station = s.id WHERE a.freq = ?"
+                    f" GROUP BY {k1}, {k2}, a.start", (level, freq, freq))
+
+    def _drop(self, station_file):
+        row = self._db.execute("SELECT id FROM stations WHERE station_file = ?", (station_file,)).fetchone()
+        if row:
+            self._db.execute("DELETE FROM readings WHERE station = ?", row)
+            self._db.execute("DELETE FROM agg WHERE station = ?", row)
+            self._db.execute("DELETE FROM stations WHERE id = ?", row)
+
+    def _index_station(self, fields, df, mtime):
+        self._drop(fields["station_file"])
+        t, v = compact(df, np.float64) if df is not None and not df.empty else (np.array([], np.int64), np.array([]))
+        lat, lon = (None if pd.isna(fields[k]) else float(fields[k]) for k in ("lat", "lon"))
+        cur = self._db.execute(
+            "INSERT INTO stations (station_file, station_id, state, district, tehsil, block, agency, mode,"
+            " station_name, lat, lon, first_time, last_time, readings, source_mtime)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (fields["station_file"], fields["station_id"], fields["state"], fields["district"], fields["tehsil"],
+             fields["block"], fields["agency"], fields["mode"], fields["station_name"], lat, lon,
+             int(t[0]) if len(t) else None, int(t[-1]) if len(t) else None, len(t), mtime))
+        sid = cur.lastrowid
+        self._db.executemany("INSERT INTO readings VALUES (?, ?, ?)", zip([sid] * len(t), t.tolist(), v.tolist()))
+        for freq, unit in TIERS.items():
+            a = aggregate(t, v, unit)
+            self._db.executemany("INSERT INTO agg VALUES (?, ?, ?, ?, ?, ?, ?)", zip(
+                [sid] * len(a["start"]), [freq] * len(a["start"]), a["start"].tolist(), a["count"].tolist(),
+                a["sum"].tolist(), a["min"].tolist(), a["max"].tolist()))
+
+    # ---- queries ----
+    @staticmethod
+    def _where(filters, alias="s"):
+        clauses, params = [], []
+        own, via, path_params = [], [], []   # district/block: the station's own path, or one alias path
+        for key in FILTERS:
+            value = filters.get(key)
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            marks = ", ".join("?" * len(values))
+            if key == "station":
+                clauses.append(f"({alias}.station_id IN ({marks}) OR {alias}.station_file IN ({marks})"
+                               f" OR {alias}.station_id IN (SELECT station_id FROM aliases WHERE station_file IN ({marks})))")
+                params += values * 3
+            elif key in PATH_FILTERS:
+                own.append(f"{alias}.{key} IN ({marks})")
+                via.append(f"{key} IN ({marks})")
+                path_params += values
+            else:
+                clauses.append(f"{alias}.{key} IN ({marks})")
+                params += values
+        if own:
+            clauses.append(f"(({' AND '.join(own)}) OR {alias}.station_id IN"
+                           f" (SELECT station_id FROM aliases WHERE {' AND '.join(via)}))")
+            params += path_params * 2
+        return clauses, params
+
+    def _alias_match(self, filters):
+        """True if some alias path matches the district/block filters (the rollup would miss it)."""
+        clauses, params = [], []
+        for key in PATH_FILTERS:
+            value = filters.get(key)
+            if value is not None:
+                values = [value] if isinstance(value, str) else list(value)
+                clauses.append(f"{key} IN ({', '.join('?' * len(values))})")
+                params += values
+        return bool(clauses) and self._db.execute(
+            f"SELECT 1 FROM aliases WHERE {' AND '.join(clauses)} LIMIT 1", params).fetchone() is not None
+
+    def _frame(self, sql, params):
+        cur = self._db.execute(sql, params)
+        return pd.DataFrame(cur.fetchall(), columns=[c[0] for c in cur.description])
+
+    def stations(self, **filters):
+        """Station table rows matching state/district/block/mode/station filters."""
+        clauses, params = self._where(filters)
+        df = self._frame("SELECT s.station_id, s.station_file, s.state, s.district, s.tehsil, s.block, s.agency,"
+                         " s.mode, s.station_name, s.lat, s.lon, s.first_time, s.last_time, s.readings"
+                         " FROM stations s" + (" WHERE " + " AND ".join(clauses) if clauses else "")
+                         + " ORDER BY s.id", params)
+        for col in ("first_time", "last_time"):
+            df[col] = pd.to_datetime(df[col], unit="s")
+        return df
+
+    def readings(self, start=None, end=None, **filters):
+        """Raw readings (station_id, station_file, dataTime, dataValue) from start through end (see end_before)."""
+        clauses, params = self._where(filters)
+        if start is not None:
+            clauses.append("r.t >= ?"); params.append(epoch(start))
+        if end is not None:
+            clauses.append("r.t < ?"); params.append(end_before(end))
+        df = self._frame("SELECT s.station_id, s.station_file, r.t AS dataTime, r.value AS dataValue"
+                         " FROM stations s JOIN readings r ON r.station = s.id"
+                         + (" WHERE " + " AND ".join(clauses) if clauses else "")
+                         + " ORDER BY s.id, r.t", params)
+        df["dataTime"] = to_time(df["dataTime"])
+        return df
+
+    def series(self, freq="monthly", by="station", start=None, end=None, **filters):
+        """Aggregated series per `by` group and daily/monthly/yearly period.
+
+        by="station": mean/min/max/count of the station's readings per period;
+        other groups: mean of the station means, min/max of the readings,
+        the number of stations and readings per period.
+        """
+        if freq not in TIERS:
+            raise ValueError(f"freq must be one of {FREQS}")
+        if by not in GROUPS:
+            raise ValueError(f"by must be one of {GROUPS}")
+        if (by != "station" and {k for k, v in filters.items() if v is not None} <= set(LEVELS[by])
+                and not self._alias_match(filters)):
+            return self._rolled_up(freq, by, start, end, filters)
+        clauses, params = self._where(filters)
+        clauses.insert(0, "a.freq = ?"); params.insert(0, freq)
+        if start is not None:
+            clauses.append("a.start >= ?"); params.append(period_start(start, freq))
+        if end is not None:
+            clauses.append("a.start <= ?"); params.append(epoch(end))
+        where = " WHERE " + " AND ".join(clauses)
+        if by == "station":
+            sql = ("SELECT s.station_id, s.station_file, a.start AS period, a.total / a.n AS mean, a.lo AS min,"
+                   " a.hi AS max, a.n AS readings FROM stations s JOIN agg a ON a.station = s.id"
+                   + where + " ORDER BY s.id, a.start")
+        else:
+            keys = ", ".join(f"s.{k}" for k in LEVELS[by])
+            sql = (f"SELECT {', '.join(f's.{k} AS {k}' for k in LEVELS[by])}, a.start AS period,"
+                   " AVG(a.total / a.n) AS mean, MIN(a.lo) AS min, MAX(a.hi) AS max,"
+                   " COUNT(*) AS stations, SUM(a.n) AS readings FROM stations s JOIN agg a ON a.station = s.id"
+                   + where + f" GROUP BY {keys}, a.start ORDER BY {keys}, a.start")
+        df = self._frame(sql, params)
+        df["period"] = to_time(df["period"])
+        return df
+
+    def _rolled_up(self, freq, by, start, end, filters):
+        """series() from the rollup table, for filters on the group's own keys only."""
+        keys = LEVELS[by]
+        clauses, params = ["level = ?", "freq = ?"], [by, freq]
+        for col, key in zip(("k1", "k2"), keys):
+            value = filters.get(key)
+            if value is not None:
+                values = [value] if isinstance(value, str) else list(value)
+                clauses.append(f"{col} IN ({', '.join('?' * len(values))})")
+                params += values
+        if start is not None:
+            clauses.append("start >= ?"); params.append(period_start(start, freq))
+        if end is not None:
+            clauses.append("start <= ?"); params.append(epoch(end))
+        cols = ", ".join(f"NULLIF({col}, '') AS {key}" for col, key in zip(("k1", "k2"), keys))
+        df = self._frame(f"SELECT {cols}, start AS period, mean, lo AS min, hi AS max, stations, n AS readings"
+                         f" FROM rollup WHERE {' AND '.join(clauses)} ORDER BY k1, k2, start", params)
+        df["period"] = to_time(df["period"])
+        return df
+
+
+# -------------------
+# HTTP
+# -------------------
+def serve(path, host="127.0.0.1", port=8080):
+    """GET /stations, /readings, /series?<filters>&start=&end=&freq=&by= as JSON records."""
+    local = threading.local()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            args = {k: (v if len(v) > 1 else v[0]) for k, v in parse_qs(url.query).items()}
+            if not hasattr(local, "db"):
+                local.db = GroundwaterDB(path)
+            t0 = time.perf_counter()
+            try:
+                fn = {"/stations": local.db.stations, "/readings": local.db.readings,
+                      "/series": local.db.series}.get(url.path)
+                if fn is None:
+                    status, body = 404, {"error": "use /stations, /readings or /series"}
+                else:
+                    df = fn(**args)
+                    status, body = 200, json.loads(df.to_json(orient="records", date_format="iso"))
+            except (TypeError, ValueError) as e:
+                status, body = 400, {"error": str(e)}
+            except Exception as e:
+                print(f"❌ {self.command} {self.path} failed:", file=sys.stderr)
+                traceback.print_exc()
+                status, body = 500, {"error": f"internal error: {e.__class__.__name__}"}
+            raw = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.send_header("X-Query-Ms", f"{(time.perf_counter() - t0) * 1000:.1f}")
+            self.end_headers()
+            self.wfile.write(raw)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    print(f"🌐 Serving {path} on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# -------------------
+# CLI
+# -------------------
+def parse_args():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--base-dir", default="AndhraPradesh", help="State folder written by getExcels.py")
+    common.add_argument("--db", help="Defaults to <base-dir>/query.sqlite")
+    ap = argparse.ArgumentParser(description="Index a downloaded state into SQLite and query it.")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    ix = sub.add_parser("index", parents=[common], help="Build or refresh the index")
+    ix.add_argument("--storage", choices=["parquet", "excel"], default=None,
+                    help="Source backend (default: parquet if <base-dir>/dataset exists, else excel)")
+    ix.add_argument("--catalog", help="Station catalogue for tehsil/block/agency missing from the Info sheet"
+                                      " (default: <State>_Stations.json)")
+
+    for name in ("stations", "readings", "series"):
+        q = sub.add_parser(name, parents=[common])
+        for key in FILTERS:
+            q.add_argument(f"--{key}", nargs="+")
+        if name != "stations":
+            q.add_argument("--start")
+            q.add_argument("--end", help="Inclusive; a date without a time (2024-03-31) includes that whole day")
+        if name == "series":
+            q.add_argument("--freq", choices=FREQS, default="monthly")
+            q.add_argument("--by", choices=GROUPS, default="station")
+        q.add_argument("--csv", help="Write the result here instead of printing it")
+
+    sv = sub.add_parser("serve", parents=[common], help="Local HTTP front end")
+    sv.add_argument("--host", default="127.0.0.1")
+    sv.add_argument("--port", type=int, default=8080)
+    return ap.parse_args()
+
+
+def main():
+    args = parse_args()
+    path = args.db or os.path.join(args.base_dir, "query.sqlite")
+    if args.command == "serve":
+        serve(path, args.host, args.port)
+        return
+    with GroundwaterDB(path) as db:
+        if args.command == "index":
+            t0 = time.perf_counter()
+            counts = db.refresh(args.base_dir, args.storage, args.catalog)
+            print(f"🗂️ {counts['indexed']} stations indexed, {counts['unchanged']} unchanged, "
+                  f"{counts['removed']} removed in {time.perf_counter() - t0:.1f}s -> {path}")
+            return
+        kwargs = {k: getattr(args, k) for k in FILTERS if getattr(args, k)}
+        for k in ("start", "end", "freq", "by"):
+            if getattr(args, k, None) is not None:
+                kwargs[k] = getattr(args, k)
+        t0 = time.perf_counter()
+        df = getattr(db, args.command)(**kwargs)
+        ms = (time.perf_counter() - t0) * 1000
+        if args.csv:
+            df.to_csv(args.csv, index=False)
+            print(f"📝 {len(df)} rows written to {args.csv} ({ms:.1f} ms)")
+        else:
+            print(df.to_string(index=False, max_rows=40))
+            print(f"({len(df)} rows, {ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except BrokenPipeError:
+        # piped into head & co.: stop quietly, and keep the interpreter's final flush off the closed pipe
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
@@ -0,0 +1,107 @@
+"""Per-station EDA results keyed by a fingerprint of the station's input.
+
+EDA.py fingerprints every input before analysing it (sha1 of the workbook
+bytes, or of the station's Parquet rows and metadata, tagged with the
+engine that analyses it). When the fingerprint
+matches the stored one the saved summary row is reused, so a rerun after an
+incremental download only recomputes the stations that changed. Inputs that
+produced no row (unreadable or empty) are remembered as such.
+Kept in <base_dir>/.cache/results.sqlite.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+RESULTS_VERSION = 4   # bump when the statistics in EDA.station_summary / batchEDA change
+
+
+def _hasher():
+    return hashlib.sha1(f"results-v{RESULTS_VERSION}:".encode("ascii"))
+
+
+def file_fingerprint(path):
+    h = _hasher()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def frame_fingerprint(info, df):
+    h = _hasher()
+    h.update(json.dumps(info, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def _json_default(o):
+    return o.item() if hasattr(o, "item") else str(o)   # numpy scalars, timestamps
+
+
+class ResultsStore:
+    def __init__(self, path):
+        self.path = str(path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS station_results (
+                station_key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                row_json TEXT,
+                computed_at REAL NOT NULL
+            )""")
+        self._rows = {key: (fp, row_json) for key, fp, row_json in self._db.execute(
+            "SELECT station_key, fingerprint, row_json FROM station_results")}
+        self._pending = {}
+        self._deleted = set()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def fresh(self, key, fingerprint):
+        """True if the stored result for key was computed from this exact input."""
+        entry = self._rows.get(key)
+        return entry is not None and entry[0] == fingerprint
+
+    def row(self, key):
+        """Stored summary row dict, or None (unknown key or input without a row)."""
+        entry = self._rows.get(key)
+        return json.loads(entry[1]) if entry and entry[1] is not None else None
+
+    def put(self, key, fingerprint, row):
+        row_json = None if row is None else json.dumps(row, default=_json_default, ensure_ascii=False)
+        self._rows[key] = (fingerprint, row_json)
+        self._pending[key] = (key, fingerprint, row_json, time.time())
+        self._deleted.discard(key)
+
+    def prune(self, keep):
+        """Forget stations that are no longer among the inputs; returns how many."""
+        gone = set(self._rows) - set(keep)
+        for key in gone:
+            del self._rows[key]
+            self._pending.pop(key, None)
+        self._deleted |= gone
+        return len(gone)
+
+    def flush(self):
+        with self._db:
+            self._db.executemany("DELETE FROM station_results WHERE station_key = ?",
+                                 [(k,) for k in self._deleted])
+            self._db.executemany("INSERT OR REPLACE INTO station_results VALUES (?, ?, ?, ?)",
+                                 list(self._pending.values()))
+        self._pending.clear()
+        self._deleted.clear()
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,110 @@
+"""Seasonal anomalies of monthly groundwater levels, for all stations at once.
+
+Monthly means go into one station x year x calendar-month array. Each
+station's climatology is the median level of every calendar month over the
+years; the deseasonalized residuals are scored robustly against their own
+median and MAD (scaled by 1.4826 to match a standard deviation), so the
+monsoon swing of a well is not an anomaly but a dry post-monsoon is.
+
+    z = (residual - median(residuals)) / (1.4826 * MAD(residuals))
+
+A month is anomalous when |z| > ANOMALY_Z. Calendar months seen in fewer
+than MIN_YEARS years, and stations with fewer than MIN_RESIDUALS scored
+months (or MAD 0), get no score. Medians are taken by sorting along an
+axis, so the whole state is one sort per statistic, without Python loops.
+"""
+import numpy as np
+import pandas as pd
+
+ANOMALY_Z = 3.5       # Iglewicz & Hoaglin's cut-off for robust z-scores
+MIN_YEARS = 3         # years a calendar month needs before it has a climatology
+MIN_RESIDUALS = 6     # scored months a station needs before it has a MAD
+MAD_SCALE = 1.4826
+COLUMNS = ["anomaly_months", "latest_month", "latest_anomaly_z", "latest_anomaly"]
+
+
+def nanmedian(a, axis=-1):
+    """np.nanmedian without its per-slice loop: NaNs sort last, pick the middle of the rest."""
+    a = np.sort(np.moveaxis(a, axis, -1), axis=-1)
+    k = np.sum(~np.isnan(a), axis=-1)[..., None]
+    lo = np.take_along_axis(a, np.maximum(k - 1, 0) // 2, axis=-1)
+    hi = np.take_along_axis(a, k // 2, axis=-1)
+    with np.errstate(invalid="ignore"):
+        return np.where(k > 0, (lo + hi) / 2, np.nan)[..., 0]
+
+
+def month_index(dates):
+    """year * 12 + month - 1 of a DatetimeIndex / datetime Series."""
+    dates = pd.DatetimeIndex(dates)
+    return dates.year.to_numpy(dtype=np.int64) * 12 + dates.month.to_numpy(dtype=np.int64) - 1
+
+
+def scores(station, month, values, n):
+    """Robust seasonal z of every (station, month index, value) reading; NaN where not assessable.
+
+    station is 0..n-1 and (station, month) pairs are unique (monthly means).
+    """
+    station, month = np.asarray(station, dtype=np.int64), np.asarray(month, dtype=np.int64)
+    values = np.asarray(values, dtype=float)
+    ok = ~np.isnan(values)
+    z = np.full(len(values), np.nan)
+    if not ok.any():
+        return z
+    first = month[ok].min() // 12 * 12
+    years = month[ok].max() // 12 - first // 12 + 1
+    cube = np.full((n, years * 12), np.nan)
+    cube[station[ok], month[ok] - first] = values[ok]
+    cube = cube.reshape(n, years, 12)
+
+    clim = nanmedian(cube, axis=1)                                  # (n, 12)
+    clim[np.sum(~np.isnan(cube), axis=1) < MIN_YEARS] = np.nan
+    resid = (cube - clim[:, None, :]).reshape(n, -1)
+    center = nanmedian(resid)
+    dev = resid - center[:, None]
+    mad = MAD_SCALE * nanmedian(np.abs(dev))
+    mad[(np.sum(~np.isnan(resid), axis=1) < MIN_RESIDUALS) | (mad == 0)] = np.nan
+    z[ok] = (dev / mad[:, None])[station[ok], month[ok] - first]
+    return z
+
+
+def _state(z):
+    if np.isnan(z):
+        return "unknown"
+    return "high" if z > ANOMALY_Z else "low" if z < -ANOMALY_Z else "normal"
+
+
+def station_anomalies(station, month, values, n):
+    """COLUMNS for stations 0..n-1: anomaly count and the state of each station's last reported month."""
+    station, month = np.asarray(station, dtype=np.int64), np.asarray(month, dtype=np.int64)
+    ok = ~np.isnan(np.asarray(values, dtype=float))
+    z = scores(station, month, values, n)
+    counts = np.bincount(station, weights=np.abs(z) > ANOMALY_Z, minlength=n).astype(int)
+
+    # last reported month per station: order by (station, month), take each station's final reading
+    latest_month = np.full(n, -1, dtype=np.int64)
+    latest_z = np.full(n, np.nan)
+    order = np.lexsort((month[ok], station[ok]))
+    s, m, zz = station[ok][order], month[ok][order], z[ok][order]
+    last = np.flatnonzero(np.r_[s[1:] != s[:-1], True]) if len(s) else np.array([], dtype=np.int64)
+    latest_month[s[last]], latest_z[s[last]] = m[last], zz[last]
+
+    return pd.DataFrame({
+        "anomaly_months": counts,
+        "latest_month": [f"{m // 12:04d}-{m % 12 + 1:02d}" if m >= 0 else "" for m in latest_month],
+        "latest_anomaly_z": latest_z,
+        "latest_anomaly": [_state(v) for v in latest_z],
+    }, columns=COLUMNS)
+
+
+def series_scores(monthly):
+    """scores() of one station's monthly mean Series (DatetimeIndex), aligned to it."""
+    valid = monthly.dropna()
+    z = scores(np.zeros(len(valid), dtype=np.int64), month_index(valid.index), valid.to_numpy(dtype=float), 1)
+    return pd.Series(z, index=valid.index).reindex(monthly.index)
+
+
+def series_anomalies(monthly):
+    """station_anomalies() of one station's monthly mean Series, as a dict."""
+    valid = monthly.dropna()
+    return station_anomalies(np.zeros(len(valid), dtype=np.int64), month_index(valid.index),
+                             valid.to_numpy(dtype=float), 1).iloc[0].to_dict()
@@ -0,0 +1,161 @@
+"""Spatial queries and interpolated maps over station_summary.csv.
+
+Stations go into a scipy cKDTree on 3-D unit-sphere coordinates, so chord
+distances convert exactly to great-circle kilometres and queries stay
+correct away from the equator.
+
+    python spatial.py --summary AndhraPradesh/outputs/station_summary.csv --near 16.5 80.6 --k 5
+    python spatial.py --summary AndhraPradesh/outputs/station_summary.csv --near 16.5 80.6 --radius 25
+    python spatial.py --summary AndhraPradesh/outputs/station_summary.csv --maps
+
+IDW grids query the k nearest stations of every cell in one call and
+weight them in numpy; EDA.py writes trend_idw_map.png and
+anomaly_idw_map.png next to trend_map.png.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0088
+IDW_MAPS = {
+    "trend_slope_m_per_year": ("trend_idw_map.png", "coolwarm", "Trend slope (m/year)"),
+    "anomaly_months": ("anomaly_idw_map.png", "plasma", "Anomaly months"),
+}
+
+
+def to_xyz(lat, lon):
+    """Unit-sphere coordinates (n, 3) of degrees lat/lon."""
+    lat, lon = np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(lon, dtype=float))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+def km_to_chord(km):
+    return 2 * np.sin(np.asarray(km, dtype=float) / (2 * EARTH_RADIUS_KM))
+
+
+class StationIndex:
+    """KD-tree over the stations of a summary frame that have lat/lon."""
+
+    def __init__(self, summary_df, lat="lat", lon="lon"):
+        df = summary_df.copy()
+        df[lat] = pd.to_numeric(df[lat], errors="coerce")
+        df[lon] = pd.to_numeric(df[lon], errors="coerce")
+        self.stations = df.dropna(subset=[lat, lon]).reset_index(drop=True)
+        self.lat = self.stations[lat].to_numpy(dtype=float)
+        self.lon = self.stations[lon].to_numpy(dtype=float)
+        self.tree = cKDTree(to_xyz(self.lat, self.lon))
+
+    def __len__(self):
+        return len(self.stations)
+
+    def nearest(self, lat, lon, k=1):
+        """The k stations closest to a point, nearest first, with distance_km."""
+        k = min(k, len(self))
+        chord, idx = self.tree.query(to_xyz(lat, lon), k=k)
+        rows = self.stations.iloc[np.atleast_1d(idx)].copy()
+        rows["distance_km"] = chord_to_km(np.atleast_1d(chord))
+        return rows
+
+    def within(self, lat, lon, radius_km):
+        """Stations within radius_km of a point, nearest first, with distance_km."""
+        idx = self.tree.query_ball_point(to_xyz(lat, lon), km_to_chord(radius_km))
+        rows = self.stations.iloc[idx].copy()
+        rows["distance_km"] = chord_to_km(np.linalg.norm(
+            to_xyz(rows["lat"], rows["lon"]) - to_xyz(lat, lon), axis=-1)) if len(rows) else []
+        return rows.sort_values("distance_km")
+
+    def idw_grid(self, values, cells=200, k=8, power=2.0, max_km=None, pad=0.05):
+        """Inverse-distance-weighted surface of `values` (one per station) over the stations' extent.
+
+        Returns (lon_edges, lat_edges, grid) with grid[i, j] for lat row i and
+        lon column j; cells farther than max_km from every station are NaN.
+        """
+        values = np.asarray(values, dtype=float)
+        ok = ~np.isnan(values)
+        tree = self.tree if ok.all() else cKDTree(self.tree.data[ok])
+        values = values[ok]
+        k = min(k, len(values))
+
+        lon0, lon1 = self.lon.min(), self.lon.max()
+        lat0, lat1 = self.lat.min(), self.lat.max()
+        dx, dy = (lon1 - lon0) * pad or 0.1, (lat1 - lat0) * pad or 0.1
+        lon_edges = np.linspace(lon0 - dx, lon1 + dx, cells + 1)
+        lat_edges = np.linspace(lat0 - dy, lat1 + dy, cells + 1)
+        glon, glat = np.meshgrid((lon_edges[:-1] + lon_edges[1:]) / 2, (lat_edges[:-1] + lat_edges[1:]) / 2)
+
+        chord, idx = tree.query(to_xyz(glat.ravel(), glon.ravel()), k=k)
+        chord, idx = chord.reshape(len(chord), -1), idx.reshape(len(idx), -1)
+        dist = chord_to_km(chord)
+        with np.errstate(divide="ignore"):
+            w = 1.0 / np.maximum(dist, 1e-9) ** power
+        grid = (w * values[idx]).sum(axis=1) / w.sum(axis=1)
+        if max_km is not None:
+            grid[dist[:, 0] > max_km] = np.nan
+        return lon_edges, lat_edges, grid.reshape(glat.shape)
+
+
+def save_idw_maps(summary_df, output_dir, cells=200, k=8, power=2.0, max_km=50):
+    """Write the IDW_MAPS images for the columns present; returns the paths written."""
+    import matplotlib.pyplot as plt
+    if summary_df.empty or not {"lat", "lon"} <= set(summary_df.columns):
+        return []
+    index = StationIndex(summary_df)
+    if len(index) < 2:
+        return []
+    written = []
+    for column, (filename, cmap, label) in IDW_MAPS.items():
+        if column not in index.stations.columns or index.stations[column].notna().sum() < 2:
+            continue
+        values = index.stations[column].to_numpy(dtype=float)
+        lon_edges, lat_edges, grid = index.idw_grid(values, cells=cells, k=k, power=power, max_km=max_km)
+        fig, ax = plt.subplots(figsize=(7, 6))
+        vmin, vmax = np.nanpercentile(values, [2, 98])   # keep a few outlier wells from flattening the map
+        if cmap == "coolwarm":
+            vmax = max(abs(vmin), abs(vmax)) or 1.0
+            vmin = -vmax
+        mesh = ax.pcolormesh(lon_edges, lat_edges, grid, cmap=cmap, shading="flat", vmin=vmin, vmax=vmax)
+        ax.scatter(index.lon, index.lat, c="k", s=4)
+        fig.colorbar(mesh, ax=ax, label=label)
+        ax.set_title(f"{label} (IDW, k={k}, p={power:g})")
+        ax.set_xlabel("Longitude"); ax.set_ylabel("Latitude")
+        path = os.path.join(output_dir, filename)
+        fig.savefig(path, dpi=200)
+        plt.close(fig)
+        written.append(path)
+    return written
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Nearest / radius station queries and IDW maps from station_summary.csv.")
+    ap.add_argument("--summary", required=True, help="station_summary.csv written by EDA.py")
+    ap.add_argument("--near", nargs=2, type=float, metavar=("LAT", "LON"))
+    ap.add_argument("--k", type=int, default=5, help="Stations to return for --near")
+    ap.add_argument("--radius", type=float, help="With --near: every station within this many km instead")
+    ap.add_argument("--maps", action="store_true", help="Write the IDW maps next to the summary")
+    ap.add_argument("--cells", type=int, default=200, help="Grid cells per side for --maps")
+    args = ap.parse_args()
+
+    index = StationIndex(pd.read_csv(args.summary))
+    print(f"📍 {len(index)} stations indexed")
+    if args.near:
+        lat, lon = args.near
+        rows = index.within(lat, lon, args.radius) if args.radius else index.nearest(lat, lon, args.k)
+        cols = [c for c in ("station_file", "district", "lat", "lon", "trend_slope_m_per_year", "distance_km")
+                if c in rows.columns]
+        print(rows[cols].to_string(index=False))
+    if args.maps:
+        import matplotlib
+        matplotlib.use("Agg")
+        for path in save_idw_maps(index.stations, os.path.dirname(os.path.abspath(args.summary)), cells=args.cells):
+            print("🗺️ Saved:", path)
+
+
+if __name__ == "__main__":
+    main()
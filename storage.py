@@ -0,0 +1,338 @@
+"""Station storage backends used by getExcels.py and read back by EDA.py.
+
+parquet (primary)
+    <State>/dataset/data/state=<s>/mode=<m>/district=<d>/<station_id>-<part>.parquet
+    <State>/dataset/stations.parquet      one row of metadata per station
+excel (optional export)
+    <State>/<Mode>/<district>_<tehsil>_<block>_<agency>_<mode>_<name>.xlsx
+
+A station is stored once, under its canonical catalog path (catalog.py);
+retire_aliases() folds copies written under its alias paths into it.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+
+def safe(s: str) -> str:
+    """Sanitize text for filenames: spaces -> _, / and \\ -> -"""
+    return str(s).replace("/", "-").replace("\\", "-").replace(" ", "_")
+
+
+def station_filename(st):
+    return f"{safe(st['district'])}_{safe(st['tehsil'])}_{safe(st['block'])}_{safe(st['agency'])}_{safe(st['mode'])}_{safe(st['station_name'])}.xlsx"
+
+
+def station_mode(st):
+    return "Manual" if st.get("mode", "Unknown").capitalize() == "Manual" else "Telemetry"
+
+
+# -------------------
+# EXCEL
+# -------------------
+class ExcelStore:
+    """One workbook per station with Info and Data sheets (the original layout)."""
+    name = "excel"
+
+    def __init__(self, base_folder, state=None):
+        self.base_folder = Path(base_folder)
+        for mode in ("Manual", "Telemetry"):
+            (self.base_folder / mode).mkdir(parents=True, exist_ok=True)
+
+    def location(self, st):
+        return self.base_folder / station_mode(st) / station_filename(st)
+
+    def exists(self, st):
+        return self.location(st).exists()
+
+    def raw_files(self, st):
+        return [self.location(st)] if self.exists(st) else []
+
+    def retire_aliases(self, st, aliases, latest=None):
+        """Fold workbooks saved under alias paths into st's; returns how many were retired.
+
+        The copy at `latest` (the manifest's file) holds the newest data and
+        replaces the canonical one; any other copy is deleted.
+        """
+        target, retired = self.location(st), 0
+        for alias in aliases:
+            path = self.location(alias)
+            if path == target or not path.exists():
+                continue
+            if str(path) == latest or not target.exists():
+                os.replace(path, target)
+            else:
+                path.unlink()
+            retired += 1
+        return retired
+
+    def write(self, st, meta, df_data):
+        df_info = pd.DataFrame(list(meta.items()), columns=["Field", "Value"])
+        with pd.ExcelWriter(self.location(st), engine="openpyxl") as writer:
+            df_info.to_excel(writer, sheet_name="Info", index=False)
+            df_data.to_excel(writer, sheet_name="Data", index=False)
+
+    def writer(self, st, meta):
+        return ExcelStationWriter(self.location(st), meta)
+
+    def append(self, st, meta, df_new):
+        """Append rows to the Data sheet; replace the Info sheet when meta is given."""
+        path = self.location(st)
+        wb = load_workbook(path)
+        if meta is not None:
+            idx = wb.sheetnames.index("Info")
+            del wb["Info"]
+            ws = wb.create_sheet("Info", idx)
+            ws.append(["Field", "Value"])
+            for k, v in meta.items():
+                ws.append([k, None if pd.isna(v) else v])
+        ws = wb["Data"]
+        header = [c.value for c in ws[1]]
+        df_new = df_new.reindex(columns=header)
+        for row in df_new.itertuples(index=False):
+            ws.append([None if pd.isna(v) else v for v in row])
+        wb.save(path)
+
+    def close(self):
+        pass
+
+
+class ExcelStationWriter:
+    """Streams one station's readings into a write-only workbook, chunk by chunk.
+
+    The file is saved (replacing any previous one) on a clean exit only.
+    """
+
+    def __init__(self, path, meta):
+        self.path = Path(path)
+        self.wb = Workbook(write_only=True)
+        info = self.wb.create_sheet("Info")
+        info.append(["Field", "Value"])
+        for k, v in meta.items():
+            info.append([k, None if pd.isna(v) else v])
+        self.data = self.wb.create_sheet("Data")
+        self.header = None
+
+    def write(self, df):
+        if self.header is None:
+            self.header = list(df.columns)
+            self.data.append(self.header)
+        for row in df.reindex(columns=self.header).itertuples(index=False):
+            self.data.append([None if pd.isna(v) else v for v in row])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.wb.save(self.path)
+        else:
+            self.wb.close()
+
+
+# -------------------
+# PARQUET
+# -------------------
+CATEGORY_COLUMNS = ["station_id", "datatypeCode", "datatypeDescription", "unitCode"]
+
+
+def typed_frame(station_id, df_data):
+    """Readings with compact dtypes: datetime64 dataTime, float32 dataValue, categorical keys."""
+    df = df_data.copy()
+    df.insert(0, "station_id", station_id)
+    if "dataTime" in df.columns:
+        df["dataTime"] = pd.to_datetime(df["dataTime"], errors="coerce")
+    if "dataValue" in df.columns:
+        df["dataValue"] = pd.to_numeric(df["dataValue"], errors="coerce").astype("float32")
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+class ParquetStore:
+    """Hive-partitioned Parquet dataset plus a separate station metadata table.
+
+    Each write/append adds a part file for the station, so appends never
+    rewrite earlier readings. The metadata table is held in memory and
+    flushed on close() (and every FLUSH_EVERY updates).
+    """
+    name = "parquet"
+    FLUSH_EVERY = 200
+
+    def __init__(self, base_folder, state=None):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("Parquet storage needs pyarrow: pip install pyarrow") from e
+        self.base_folder = Path(base_folder)
+        self.state = state or self.base_folder.name
+        self.root = self.base_folder / "dataset"
+        self.data_root = self.root / "data"
+        self.meta_path = self.root / "stations.parquet"
+        self.data_root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self._meta = {}
+        if self.meta_path.exists():
+            for row in pd.read_parquet(self.meta_path).to_dict("records"):
+                self._meta[row["station_id"]] = row
+
+    def partition(self, st):
+        return (self.data_root / f"state={safe(self.state)}" / f"mode={station_mode(st)}"
+                / f"district={safe(st['district'])}")
+
+    def location(self, st):
+        return self.partition(st) / f"{safe(st['station_id'])}-*.parquet"
+
+    def parts(self, st):
+        return sorted(self.partition(st).glob(f"{safe(st['station_id'])}-*.parquet"))
+
+    def exists(self, st):
+        return st["station_id"] in self._meta and bool(self.parts(st))
+
+    def raw_files(self, st):
+        return self.parts(st)
+
+    def retire_aliases(self, st, aliases, latest=None):
+        """Move or delete parts saved under alias districts; returns how many aliases were retired.
+
+        Parts of the alias whose district the metadata row records are the
+        newest and replace the canonical ones; the row is then re-pointed at st.
+        """
+        target, retired = self.partition(st), 0
+        row = self._meta.get(st["station_id"])
+        for alias in aliases:
+            folder = self.partition(alias)
+            parts = sorted(folder.glob(f"{safe(st['station_id'])}-*.parquet")) if folder != target else []
+            if not parts:
+                continue
+            if (row is not None and row.get("district") == alias.get("district")) or not self.parts(st):
+                for part in self.parts(st):
+                    part.unlink()
+                target.mkdir(parents=True, exist_ok=True)
+                for part in parts:
+                    os.replace(part, target / part.name)
+                if row is not None:
+                    self._set_meta(st, json.loads(row["meta_json"]))
+                    row = self._meta[st["station_id"]]
+            else:
+                for part in parts:
+                    part.unlink()
+            retired += 1
+        return retired
+
+    def _write_part(self, st, df_data, seq):
+        folder = self.partition(st)
+        folder.mkdir(parents=True, exist_ok=True)
+        typed_frame(st["station_id"], df_data).to_parquet(
+            folder / f"{safe(st['station_id'])}-{seq:05d}.parquet", index=False)
+
+    def _set_meta(self, st, meta):
+        row = {
+            "station_id": st["station_id"],
+            "station_file": station_filename(st),
+            "state": self.state,
+            "mode": station_mode(st),
+            "district": st.get("district"),
+            "tehsil": st.get("tehsil"),
+            "block": st.get("block"),
+            "agency": st.get("agency"),
+            "station_name": st.get("station_name"),
+            "latitude": pd.to_numeric(meta.get("latitude"), errors="coerce"),
+            "longitude": pd.to_numeric(meta.get("longitude"), errors="coerce"),
+            "data_available_from": meta.get("data_available_from"),
+            "data_available_Till": meta.get("data_available_Till"),
+            "meta_json": json.dumps(meta, ensure_ascii=False, default=str),
+        }
+        with self._lock:
+            self._meta[st["station_id"]] = row
+            self._dirty += 1
+            if self._dirty >= self.FLUSH_EVERY:
+                self._flush()
+
+    def write(self, st, meta, df_data):
+        for part in self.parts(st):
+            part.unlink()
+        self._write_part(st, df_data, 0)
+        self._set_meta(st, meta)
+
+    def writer(self, st, meta):
+        return ParquetStationWriter(self, st, meta)
+
+    def append(self, st, meta, df_new):
+        if not df_new.empty:
+            existing = self.parts(st)
+            seq = int(existing[-1].stem.rsplit("-", 1)[1]) + 1 if existing else 0
+            self._write_part(st, df_new, seq)
+        if meta is not None:
+            self._set_meta(st, meta)
+
+    def _flush(self):
+        if not self._meta:
+            return
+        df = pd.DataFrame(list(self._meta.values()))
+        for col in ("station_id", "state", "mode", "district"):
+            df[col] = df[col].astype("category")
+        tmp = self.meta_path.with_suffix(".tmp")
+        df.to_parquet(tmp, index=False)
+        tmp.replace(self.meta_path)
+        self._dirty = 0
+
+    def close(self):
+        with self._lock:
+            self._flush()
+
+    # ---- reading ----
+    def read_stations(self):
+        """Station metadata table."""
+        if not self.meta_path.exists():
+            return pd.DataFrame()
+        return pd.read_parquet(self.meta_path)
+
+    def read_data(self, columns=None, filter=None):
+        """All readings (optionally filtered with a pyarrow.dataset expression)."""
+        import pyarrow.dataset as ds
+        if not any(self.data_root.rglob("*.parquet")):
+            return pd.DataFrame(columns=["station_id", "dataTime", "dataValue"])
+        dataset = ds.dataset(self.data_root, format="parquet",
+                             partitioning=ds.HivePartitioning.discover(infer_dictionary=True))
+        return dataset.to_table(columns=columns, filter=filter).to_pandas()
+
+
+class ParquetStationWriter:
+    """Replaces a station's readings with one part file per chunk written.
+
+    The metadata row is only recorded on a clean exit, so an interrupted
+    download is not mistaken for a complete one.
+    """
+
+    def __init__(self, store, st, meta):
+        self.store, self.st, self.meta = store, st, meta
+        for part in store.parts(st):
+            part.unlink()
+        self.seq = 0
+
+    def write(self, df):
+        self.store._write_part(self.st, df, self.seq)
+        self.seq += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.store._set_meta(self.st, self.meta)
+
+
+STORES = {"parquet": ParquetStore, "excel": ExcelStore}
+
+
+def open_store(name, base_folder, state=None):
+    if name not in STORES:
+        raise ValueError(f"Unknown storage backend {name!r}; choose from {sorted(STORES)}")
+    return STORES[name](base_folder, state)
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+def fingerprint(meta):
+    """Stable hash of a station's metadata dict."""
+    raw = json.dumps(meta, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class SyncManifest:
+    """Per-station sync state keyed by station_id.
+
+    Every update is appended to a JSONL journal and flushed straight away, so a
+    crash part way through a state loses at most the station in flight. Loading
+    replays the journal (last line wins) and compact() rewrites it to one line
+    per station.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue   # torn last line from an interrupted run
+                    self.entries[entry["station_id"]] = entry
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    def get(self, station_id):
+        return self.entries.get(station_id)
+
+    def update(self, station_id, **fields):
+        with self._lock:
+            entry = dict(self.entries.get(station_id, {}), station_id=station_id, **fields)
+            self.entries[station_id] = entry
+            self._fh.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            self._fh.flush()
+            return entry
+
+    def compact(self):
+        with self._lock:
+            self._fh.close()
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            os.replace(tmp, self.path)
+            self._fh = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        self.compact()
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RetryQueue(SyncManifest):
+    """Stations whose download failed, kept across runs until one succeeds.
+
+    Each entry holds the catalog record, the last error, the attempt count and
+    next_at, the earliest time worth trying again (exponential backoff from
+    BASE_DELAY, capped at MAX_DELAY). With max_attempts, pending() and
+    all_due_at() leave out stations that already failed that often; they stay
+    queued (and reported) until a normal run succeeds. compact() drops
+    stations that are done.
+    """
+    BASE_DELAY = 30
+    MAX_DELAY = 6 * 3600
+
+    def fail(self, st, error):
+        prev = self.entries.get(st["station_id"]) or {}
+        attempts = prev.get("attempts", 0) + 1 if prev.get("status") == "pending" else 1
+        delay = min(self.MAX_DELAY, self.BASE_DELAY * 2 ** (attempts - 1))
+        return self.update(st["station_id"], status="pending", station=st, error=str(error),
+                           attempts=attempts, next_at=time.time() + delay)
+
+    def done(self, station_id):
+        entry = self.entries.get(station_id)
+        if entry and entry.get("status") == "pending":
+            self.update(station_id, status="done")
+
+    def _retrying(self, max_attempts):
+        return [e for e in list(self.entries.values())
+                if e.get("status") == "pending" and (max_attempts is None or e.get("attempts", 0) < max_attempts)]
+
+    def pending(self, due=True, max_attempts=None):
+        """Catalog records still failing, fewer than max_attempts times; only those past their backoff when `due`."""
+        now = time.time()
+        return [e["station"] for e in self._retrying(max_attempts) if not due or e.get("next_at", 0) <= now]
+
+    def given_up(self, max_attempts):
+        """Station ids still failing after max_attempts attempts."""
+        return [sid for sid, e in self.entries.items()
+                if e.get("status") == "pending" and e.get("attempts", 0) >= max_attempts]
+
+    def all_due_at(self, max_attempts=None):
+        """Time by which every station pending() would retry is due, or None if there is none."""
+        times = [e.get("next_at", 0) for e in self._retrying(max_attempts)]
+        return max(times) if times else None
+
+    def compact(self):
+        with self._lock:
+            self.entries = {k: e for k, e in self.entries.items() if e.get("status") != "done"}
+        super().compact()
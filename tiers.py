@@ -0,0 +1,154 @@
+"""Daily / monthly / yearly aggregates of high-frequency (Telemetry) stations.
+
+Readings are reduced to compact arrays (int64 epoch seconds, float32 value)
+and aggregated per calendar day, month and year into count, sum, min and
+max. Aggregates of separate chunks merge exactly, so getExcels.py builds the
+tiers window by window while downloading and extends them on appends,
+without keeping or rereading raw readings. EDA.py analyses Telemetry
+stations from the monthly tier.
+
+    <State>/tiers/<Mode>/<station_file stem>.npz
+
+A tier file is only trusted while it is at least as new as every raw file
+of the station (workbook or Parquet parts); otherwise it is rebuilt.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+TIERED_MODES = ("Telemetry",)
+TIERS = {"daily": "D", "monthly": "M", "yearly": "Y"}
+FIELDS = ("start", "count", "sum", "min", "max")
+
+
+def compact(df, dtype=np.float32):
+    """(t, v): int64 epoch seconds and `dtype` values of df, sorted by time, NaN/NaT dropped."""
+    t = pd.to_datetime(df["dataTime"], errors="coerce").to_numpy(dtype="datetime64[s]")
+    v = pd.to_numeric(df["dataValue"], errors="coerce").to_numpy(dtype=dtype)
+    ok = ~(np.isnat(t) | np.isnan(v))
+    t, v = t[ok].astype(np.int64), v[ok]
+    order = np.argsort(t, kind="stable")
+    return t[order], v[order]
+
+
+def _reduce(start, count, total, lo, hi):
+    """Combine rows with equal start (start sorted) into one row each."""
+    if len(start) == 0:
+        return {"start": start, "count": count, "sum": total, "min": lo, "max": hi}
+    first = np.flatnonzero(np.r_[True, start[1:] != start[:-1]])
+    return {"start": start[first],
+            "count": np.add.reduceat(count, first),
+            "sum": np.add.reduceat(total, first),
+            "min": np.minimum.reduceat(lo, first),
+            "max": np.maximum.reduceat(hi, first)}
+
+
+def aggregate(t, v, unit):
+    """Aggregate sorted compact arrays per calendar `unit` (numpy datetime unit D, M or Y)."""
+    start = t.astype("datetime64[s]").astype(f"datetime64[{unit}]").astype("datetime64[s]").astype(np.int64)
+    return _reduce(start, np.ones(len(t), dtype=np.int64), v.astype(np.float64), v, v)
+
+
+def merge(a, b):
+    """Aggregates of a and b together, as if built from both sets of readings."""
+    both = {f: np.concatenate([a[f], b[f]]) for f in FIELDS}
+    order = np.argsort(both["start"], kind="stable")
+    return _reduce(*(both[f][order] for f in FIELDS))
+
+
+def _empty():
+    return {"start": np.array([], dtype=np.int64), "count": np.array([], dtype=np.int64),
+            "sum": np.array([], dtype=np.float64), "min": np.array([], dtype=np.float32),
+            "max": np.array([], dtype=np.float32)}
+
+
+class Tiers:
+    """The three aggregate tables of one station, plus its metadata."""
+
+    def __init__(self, meta=None, tables=None):
+        self.meta = dict(meta or {})
+        self.tables = tables or {name: _empty() for name in TIERS}
+
+    @classmethod
+    def from_frame(cls, df, meta=None):
+        tiers = cls(meta)
+        tiers.add(df)
+        return tiers
+
+    def add(self, df):
+        """Fold a chunk of readings (dataTime, dataValue) into every tier."""
+        if df is None or df.empty or "dataTime" not in df.columns:
+            return
+        t, v = compact(df)
+        if len(t):
+            for name, unit in TIERS.items():
+                self.tables[name] = merge(self.tables[name], aggregate(t, v, unit))
+
+    @property
+    def readings(self):
+        return int(self.tables["yearly"]["count"].sum())
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for table in self.tables.values() for a in table.values())
+
+    def frame(self, tier="monthly"):
+        """DataFrame of one tier indexed by period start: mean, min, max, count."""
+        table = self.tables[tier]
+        return pd.DataFrame({
+            "mean": table["sum"] / table["count"],
+            "min": table["min"], "max": table["max"], "count": table["count"],
+        }, index=pd.DatetimeIndex(table["start"].astype("datetime64[s]"), name="dataTime"))
+
+    def series(self, tier="monthly"):
+        """(dataTime, dataValue) with one mean per period, a stand-in for the raw readings."""
+        table = self.tables[tier]
+        return pd.DataFrame({"dataTime": table["start"].astype("datetime64[s]").astype("datetime64[ns]"),
+                             "dataValue": table["sum"] / table["count"]})
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {f"{name}_{f}": a for name, table in self.tables.items() for f, a in table.items()}
+        arrays["meta"] = np.array(json.dumps(self.meta, ensure_ascii=False, default=str))
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as fh:
+            np.savez(fh, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, names=tuple(TIERS)):
+        """Read a tier file; only the tiers in `names` are loaded."""
+        with np.load(path) as z:
+            tables = {name: {f: z[f"{name}_{f}"] for f in FIELDS} for name in names}
+            return cls(json.loads(str(z["meta"])), tables)
+
+
+class TierStore:
+    """Where the tier files of a state folder live and whether they are current."""
+
+    def __init__(self, base_folder):
+        self.root = Path(base_folder) / "tiers"
+
+    def path(self, mode, station_file):
+        return self.root / str(mode) / (Path(station_file).stem + ".npz")
+
+    def fresh(self, mode, station_file, raw_files):
+        """True if the tier file exists and is no older than any of raw_files."""
+        try:
+            mtime = os.stat(self.path(mode, station_file)).st_mtime_ns
+            return all(os.stat(f).st_mtime_ns <= mtime for f in raw_files)
+        except OSError:
+            return False
+
+    def load(self, mode, station_file, names=tuple(TIERS)):
+        return Tiers.load(self.path(mode, station_file), names)
+
+    def save(self, mode, station_file, tiers):
+        tiers.save(self.path(mode, station_file))
+
+    def drop(self, mode, station_file):
+        self.path(mode, station_file).unlink(missing_ok=True)
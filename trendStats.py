@@ -0,0 +1,269 @@
+"""Trend statistics for groundwater level series.
+
+- OLS slope / p-value (same formulas as scipy.stats.linregress)
+- Mann-Kendall S in O(n log n) by merge-sort inversion counting, with the
+  tie-corrected variance
+- Sen's slope: exact from all pairs up to SEN_EXACT_MAX points, above that
+  by bisection on the slope with the same inversion counting, O(n log n) per
+  step, to SEN_RTOL of the spread of the month-to-month changes
+- trend_batch(): all of the above for many stations in one call, with OLS and
+  Mann-Kendall vectorized across stations
+"""
+import numpy as np
+import pandas as pd
+from scipy.stats import norm, t as student_t
+
+TINY = 1.0e-20   # as in scipy.stats.linregress
+SEN_EXACT_MAX = 2000   # points up to which Sen's slope enumerates all pairs (~2M slopes, 16 MB)
+SEN_RTOL = 1.0e-9      # precision of Sen's slope above SEN_EXACT_MAX, relative to max - min of np.diff(x)
+
+
+# ========= OLS =========
+def ols_trend(y):
+    """(slope per step, two-sided p-value) of y against 0..n-1; NaNs for n < 3."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n < 3:
+        return np.nan, np.nan
+    ssxm, ssxym, _, ssym = np.cov(np.arange(n), y, bias=1).flat
+    return _ols_from_moments(n, ssxm, ssxym, ssym)
+
+
+def _ols_from_moments(n, ssxm, ssxym, ssym):
+    n, ssxm, ssxym, ssym = (np.asarray(a, dtype=float) for a in (n, ssxm, ssxym, ssym))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        degenerate = (ssxm == 0) | (ssym == 0)
+        r = np.where(degenerate, np.where(ssxym == 0, np.nan, 0.0), ssxym / np.sqrt(ssxm * ssym))
+        r = np.clip(r, -1.0, 1.0)
+        slope = ssxym / ssxm
+        df = n - 2
+        t = r * np.sqrt(df / ((1.0 - r + TINY) * (1.0 + r + TINY)))
+        p = 2 * student_t.sf(np.abs(t), df)
+    short = n < 3
+    slope = np.where(short, np.nan, slope)
+    p = np.where(short, np.nan, p)
+    return (slope[()], p[()])
+
+
+def ols_trend_grouped(values, offsets):
+    """Vectorized ols_trend for series concatenated in `values`, split at `offsets`.
+
+    offsets are the start index of each series (like np.add.reduceat); the
+    x axis restarts at 0 for every series.
+    """
+    values = np.asarray(values, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(np.append(offsets, len(values)))
+    if len(values) == 0:
+        return np.full(len(offsets), np.nan), np.full(len(offsets), np.nan)
+    x = np.arange(len(values)) - np.repeat(offsets, lengths)
+    nz = np.maximum(lengths, 1)
+    xbar = (lengths - 1) / 2.0
+    ybar = np.add.reduceat(values, offsets) / nz
+    xm = x - np.repeat(xbar, lengths)
+    ym = values - np.repeat(ybar, lengths)
+    ssxm = np.add.reduceat(xm * xm, offsets) / nz
+    ssxym = np.add.reduceat(xm * ym, offsets) / nz
+    ssym = np.add.reduceat(ym * ym, offsets) / nz
+    return _ols_from_moments(lengths, ssxm, ssxym, ssym)
+
+
+# ========= MANN-KENDALL =========
+def _lengths(offsets, total):
+    return np.diff(np.append(offsets, total))
+
+
+def count_discordant_grouped(ranks, offsets):
+    """count_discordant of every series concatenated in `ranks`, split at `offsets`.
+
+    Bottom-up merge sort: at each level the right half of every block pair
+    counts the left-half elements above it with one vectorized searchsorted,
+    then the pair is merged. Block pairs never straddle two series, so all
+    series go through the log2(longest) levels together.
+    """
+    r = np.asarray(ranks, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = _lengths(offsets, len(r))
+    counts = np.zeros(len(offsets), dtype=np.int64)
+    if len(r) < 2:
+        return counts
+    m = int(r.max()) + 1
+    group = np.repeat(np.arange(len(offsets)), lengths)
+    start = np.repeat(offsets, lengths)
+    pos = np.arange(len(r), dtype=np.int64) - start
+    width = 1
+    while width < lengths.max():
+        block = pos // width
+        pair = start + block // 2        # unique across series, ascending along the array
+        left = (block % 2) == 0
+        key = pair * m + r
+        left_keys = key[left]
+        right_keys = key[~left]
+        right_pair = pair[~left]
+        hi = np.searchsorted(left_keys, right_pair * m + m, side="left")
+        lo = np.searchsorted(left_keys, right_keys, side="right")
+        counts += np.bincount(group[~left], weights=hi - lo, minlength=len(offsets)).astype(np.int64)
+        r = np.sort(key, kind="stable") % m
+        width *= 2
+    return counts
+
+
+def count_discordant(ranks):
+    """Pairs i < j with ranks[i] > ranks[j] (ties not counted)."""
+    r = np.asarray(ranks, dtype=np.int64)
+    return int(count_discordant_grouped(r, [0])[0]) if len(r) else 0
+
+
+def mk_score(x):
+    """(S, tie-corrected Var(S), n) of the Mann-Kendall statistic."""
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    if n < 2:
+        return 0, 0.0, n
+    _, ranks, ties = np.unique(x, return_inverse=True, return_counts=True)
+    tie_pairs = int((ties * (ties - 1) // 2).sum())
+    total_pairs = n * (n - 1) // 2
+    s = total_pairs - tie_pairs - 2 * count_discordant(ranks)
+    var_s = (n*(n-1)*(2*n+5) - float((ties*(ties-1)*(2*ties+5)).sum()))/18
+    return s, var_s, n
+
+
+def mk_pvalue(s, var_s):
+    if var_s <= 0:
+        return np.nan
+    z = (s-1 if s>0 else s+1 if s<0 else 0)/np.sqrt(var_s)
+    return 2*(1 - norm.cdf(abs(z)))
+
+
+def mk_test(x):
+    """(S, Var(S), two-sided p-value); p is NaN for fewer than 3 points."""
+    s, var_s, n = mk_score(x)
+    if n < 3:
+        return s, var_s, np.nan
+    return s, var_s, mk_pvalue(s, var_s)
+
+
+def mk_test_grouped(values, offsets):
+    """Vectorized mk_test for series concatenated in `values`, split at `offsets`.
+
+    Returns arrays (S, Var(S), p-value), one entry per series; empty series are allowed.
+    """
+    values = np.asarray(values, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n = _lengths(offsets, len(values))
+    group = np.repeat(np.arange(len(offsets)), n)
+    _, ranks = np.unique(values, return_inverse=True)
+    ranks = ranks.reshape(-1)
+    # ties are counted within each series: unique (series, rank) pairs
+    m = int(ranks.max()) + 1 if len(ranks) else 1
+    tied, ties = np.unique(group * m + ranks, return_counts=True)
+    tie_group = tied // m
+    tie_pairs = np.bincount(tie_group, weights=ties * (ties - 1) // 2, minlength=len(offsets))
+    tie_var = np.bincount(tie_group, weights=ties * (ties - 1) * (2 * ties + 5), minlength=len(offsets))
+
+    s = (n * (n - 1) // 2 - tie_pairs.astype(np.int64)
+         - 2 * count_discordant_grouped(ranks, offsets))
+    var_s = (n * (n - 1) * (2 * n + 5) - tie_var) / 18
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.sign(s) * (np.abs(s) - 1) / np.sqrt(var_s)
+        p = 2 * (1 - norm.cdf(np.abs(z)))
+    p[(n < 3) | (var_s <= 0)] = np.nan
+    return s, var_s, p
+
+
+# ========= SEN'S SLOPE =========
+def sens_slope(x):
+    """Median of (x[j]-x[i])/(j-i) over all i < j, per step; NaN for n < 2.
+
+    Up to SEN_EXACT_MAX points the slopes are filled lag by lag into one
+    preallocated buffer; longer series (daily or raw readings) go through
+    _sens_slope_bisect, which needs O(n) memory.
+    """
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    if n < 2:
+        return np.nan
+    if n > SEN_EXACT_MAX:
+        return _sens_slope_bisect(x)
+    slopes = np.empty(n * (n - 1) // 2)
+    i = 0
+    for k in range(1, n):
+        m = n - k
+        slopes[i:i+m] = (x[k:] - x[:-k]) / k
+        i += m
+    return float(np.median(slopes))
+
+
+def _slopes_below(x, t):
+    """Pairs i < j with (x[j]-x[i])/(j-i) < t: the discordant pairs of x - t*i."""
+    _, ranks = np.unique(x - t * np.arange(len(x)), return_inverse=True)
+    return count_discordant(ranks.reshape(-1))
+
+
+def _kth_slope(x, k, lo, hi, tol):
+    """k-th smallest pairwise slope (0-based), bisected inside [lo, hi] down to width tol."""
+    while hi - lo > tol:
+        mid = (lo + hi) / 2
+        if mid in (lo, hi):
+            break
+        if _slopes_below(x, mid) <= k:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+def _sens_slope_bisect(x):
+    """Sen's slope without materializing the pairs.
+
+    Every pairwise slope is a weighted mean of the lag-1 differences, so the
+    median lies between their min and max; each bisection step counts the
+    slopes below the midpoint in O(n log n); about 30 steps reach SEN_RTOL.
+    """
+    steps = np.diff(x)
+    lo, hi = float(steps.min()), float(steps.max())
+    if lo == hi:
+        return lo
+    tol = SEN_RTOL * (hi - lo)
+    total = len(x) * (len(x) - 1) // 2
+    upper = _kth_slope(x, total // 2, lo, hi, tol)
+    if total % 2:
+        return float(upper)
+    return float((_kth_slope(x, total // 2 - 1, lo, upper + tol, tol) + upper) / 2)
+
+
+# ========= BATCH =========
+def trend_batch(series, per_year=12):
+    """Trend statistics for many stations at once.
+
+    series: dict {station: 1-D array-like}, NaNs dropped. Returns a DataFrame
+    indexed by station with n, ols_slope and sens_slope (per year, given
+    `per_year` steps a year), ols_pval, mk_s, mk_var and mk_pval.
+    """
+    keys = list(series)
+    arrays = []
+    for k in keys:
+        a = np.asarray(series[k], dtype=float)
+        arrays.append(a[~np.isnan(a)])
+    lengths = np.array([len(a) for a in arrays], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if keys else np.array([], dtype=np.int64)
+    values = np.concatenate(arrays) if arrays else np.array([])
+
+    out = pd.DataFrame(index=pd.Index(keys, name="station"))
+    out["n"] = lengths
+    if keys:
+        # reduceat needs non-empty segments; empty series come out as NaN anyway
+        nonempty = lengths > 0
+        slope = np.full(len(keys), np.nan)
+        pval = np.full(len(keys), np.nan)
+        if nonempty.any():
+            s, p = ols_trend_grouped(values, offsets[nonempty])
+            slope[nonempty], pval[nonempty] = s, p
+        out["ols_slope"] = slope * per_year
+        out["ols_pval"] = pval
+    else:
+        out["ols_slope"] = out["ols_pval"] = np.array([], dtype=float)
+
+    out["mk_s"], out["mk_var"], out["mk_pval"] = mk_test_grouped(values, offsets)
+    out["sens_slope"] = [sens_slope(a) * per_year for a in arrays]
+    return out